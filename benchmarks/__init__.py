@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The bot modules in src/ import each other by bare name
+SRC_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+if SRC_PATH not in sys.path:
+    sys.path.insert(0, SRC_PATH)
@@ -0,0 +1,79 @@
+import itertools
+
+from config import TELEGRAM_USER_ID
+
+# Stand-ins for the Telegram and Google Sheets objects the handlers talk to.
+# They answer immediately and count the calls, so only the bot's own work is measured.
+
+_file_ids = itertools.count()
+
+
+class FakeBot:
+    def __init__(self):
+        self.calls = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls += 1
+        return FakeMessage(text)
+
+
+class FakePhotoSize:
+    def __init__(self):
+        self.file_id = f"fake-file-{next(_file_ids)}"
+
+
+class FakeMessage:
+    def __init__(self, text=""):
+        self.text = text
+        self.replies = 0
+        self.photo = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies += 1
+        return FakeMessage(text)
+
+    async def reply_photo(self, photo, **kwargs):
+        self.replies += 1
+        if hasattr(photo, "read"):
+            photo.read()
+        message = FakeMessage()
+        message.photo = [FakePhotoSize()]
+        return message
+
+
+class FakeUser:
+    id = TELEGRAM_USER_ID
+
+
+class FakeUpdate:
+    def __init__(self, text=""):
+        self.message = self.effective_message = FakeMessage(text)
+        self.effective_user = FakeUser()
+
+
+class FakeContext:
+    def __init__(self, bot=None):
+        self.bot = bot or FakeBot()
+        self.user_data = {}
+
+
+class FakeWorksheet:
+    def __init__(self):
+        self.calls = 0
+        self.rows = 0
+
+    def append_rows(self, rows, **kwargs):
+        self.calls += 1
+        self.rows += len(rows)
+
+
+class FakeSheetClient:
+    """
+    Same interface as remote.RemoteSheetClient, backed by a FakeWorksheet.
+    """
+
+    def __init__(self):
+        self.sheet = FakeWorksheet()
+
+    def call(self, method, *args, **kwargs):
+        return getattr(self.sheet, method)(*args, **kwargs)
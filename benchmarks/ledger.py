@@ -0,0 +1,52 @@
+import datetime
+import random
+
+from constants import categories
+from storage import SQLiteExpenseStore
+
+# Synthetic ledgers span LEDGER_YEARS years ending at LEDGER_END, whatever the size
+LEDGER_END = datetime.datetime(2024, 12, 31, 23, 59)
+LEDGER_YEARS = 5
+BATCH_SIZE = 50_000
+
+
+def generate_rows(size, seed=0):
+    """
+    Yield size expenses shaped as EXPENSE_HEADERS, spread evenly over the ledger span.
+    The same size and seed always produce the same ledger.
+    """
+    rng = random.Random(seed)
+    taxonomy = [
+        (category, subcategory)
+        for category, subcategories in categories.items()
+        for subcategory in subcategories
+    ]
+    start = LEDGER_END.replace(year=LEDGER_END.year - LEDGER_YEARS)
+    step = (LEDGER_END - start) / size
+    for i in range(size):
+        when = start + step * i
+        category, subcategory = rng.choice(taxonomy)
+        yield (
+            when.strftime("%B"),
+            category,
+            subcategory,
+            round(rng.uniform(1, 200), 2),
+            when.strftime("%d/%m/%Y"),
+            when.isoformat(),
+        )
+
+
+def build_ledger(path, size, seed=0):
+    """
+    Write a synthetic ledger of size expenses to a new SQLite database.
+    """
+    store = SQLiteExpenseStore(path)
+    batch = []
+    for row in generate_rows(size, seed):
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            store.add_rows(batch)
+            batch = []
+    if batch:
+        store.add_rows(batch)
+    store.close()
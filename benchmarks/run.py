@@ -0,0 +1,268 @@
+"""
+Benchmark the bot handlers over synthetic ledgers of growing size.
+
+For every ledger size a deterministic ledger is generated once; then every operation
+runs in its own process on a fresh copy of it, driven with fake Telegram objects and a
+fake Google Sheets worksheet. Each operation reports p50/p95 latency, the peak RSS of
+its process and the bytes read and written per call (read/write syscalls, from
+/proc/self/io, Linux only). The chart rendering workers are separate processes, so
+their memory and I/O are not included.
+
+Usage: python -m benchmarks.run [--sizes 1000 10000 ...] [--repeat N] [--output FILE]
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import SRC_PATH
+from benchmarks.fakes import FakeContext, FakeSheetClient, FakeUpdate
+from benchmarks.ledger import build_ledger
+from constants import LOCAL_CHART_PATH, LOCAL_LEDGER_PATH
+from metrics import read_io
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+# Expenses the sync operation finds waiting to be uploaded on every call
+SYNC_BACKLOG = 100
+
+
+async def save_expense(context):
+    import handlers
+
+    context.user_data["selected_category"] = "Food"
+    context.user_data["selected_subcategory"] = "Market"
+    await handlers.save_on_local_spreadsheet(FakeUpdate("12,50"), context)
+
+
+async def list_expenses_to_delete(context):
+    import handlers
+
+    await handlers.ask_deleting(FakeUpdate("❌ Delete"), context)
+
+
+async def make_list(context):
+    import handlers
+
+    await handlers.make_list(FakeUpdate("📋 List"), context)
+
+
+def chart_operation(name):
+    async def operation(context):
+        import handlers
+
+        await getattr(handlers, name)(FakeUpdate(), context)
+
+    return operation
+
+
+def reset_chart_cache():
+    """
+    Forget the rendered charts, so the chart operations measure a full render.
+    """
+    import chart_cache
+
+    shutil.rmtree(LOCAL_CHART_PATH, ignore_errors=True)
+    chart_cache._chart_caches.clear()
+
+
+async def sync_to_google_sheets(context):
+    import sync
+
+    await asyncio.to_thread(sync.sync_to_google_sheets)
+
+
+def rewind_sync_cursor():
+    """
+    Enable the sync and leave SYNC_BACKLOG expenses to upload.
+    """
+    import remote
+    from settings import get_settings
+    from storage import get_expense_store
+
+    remote._remote_expense_sheet = FakeSheetClient()
+    cursor = max(get_expense_store().last_id() - SYNC_BACKLOG, 0)
+    get_settings().update("google_sync", enabled=True, cursor=cursor)
+
+
+# name: (coroutine taking the context, setup run before every call or None)
+OPERATIONS = {
+    "save_on_local_spreadsheet": (save_expense, None),
+    "show_expenses": (list_expenses_to_delete, None),
+    "make_list": (make_list, None),
+    "show_yearly_chart": (chart_operation("show_yearly_chart"), reset_chart_cache),
+    "show_trend_chart": (chart_operation("show_trend_chart"), reset_chart_cache),
+    "show_monthly_chart": (chart_operation("show_monthly_chart"), reset_chart_cache),
+    "show_heatmap_chart": (chart_operation("show_heatmap_chart"), reset_chart_cache),
+    "sync_to_google_sheets": (sync_to_google_sheets, rewind_sync_cursor),
+}
+
+
+def peak_rss_mb():
+    """
+    Return the peak resident set size of this process in MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[round(p / 100 * (len(ordered) - 1))]
+
+
+async def measure(name, repeat):
+    """
+    Run an operation once to warm up, then repeat times, and return its measures.
+    """
+    operation, setup = OPERATIONS[name]
+    context = FakeContext()
+    if setup is not None:
+        setup()
+    await operation(context)
+
+    # Reading /proc/self/io counts as I/O too: leave it out of the measures
+    read_before, _ = read_io()
+    read_overhead = read_io()[0] - read_before
+
+    latencies, read_bytes, write_bytes = [], 0, 0
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        read_before, write_before = read_io()
+        started = time.perf_counter()
+        await operation(context)
+        latencies.append(time.perf_counter() - started)
+        read_after, write_after = read_io()
+        read_bytes += read_after - read_before - read_overhead
+        write_bytes += write_after - write_before
+
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "read_bytes": read_bytes // repeat,
+        "write_bytes": write_bytes // repeat,
+    }
+
+
+def run_operation(name, repeat):
+    """
+    Measure an operation in this process, whose working directory holds the ledger.
+    """
+    from render import shutdown_render_executor
+
+    logging.disable(logging.INFO)
+    try:
+        return asyncio.run(measure(name, repeat))
+    finally:
+        shutdown_render_executor()
+
+
+def spawn_operation(name, ledger_path, repeat):
+    """
+    Measure an operation in a new process, on a fresh copy of the ledger.
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        copy_path = os.path.join(workdir, LOCAL_LEDGER_PATH)
+        os.makedirs(os.path.dirname(copy_path))
+        shutil.copyfile(ledger_path, copy_path)
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--operation", name]
+            + ["--repeat", str(repeat)],
+            cwd=workdir,
+            env={**os.environ, "PYTHONPATH": os.path.dirname(SRC_PATH)},
+            capture_output=True,
+            text=True,
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"{name} failed:\n{result.stderr}")
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(SRC_PATH),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes, operations, repeat, seed):
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "sizes": {},
+    }
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as ledger_dir:
+            ledger_path = os.path.join(ledger_dir, "expenses.db")
+            started = time.perf_counter()
+            build_ledger(ledger_path, size, seed)
+            entry = {
+                "ledger_build_s": round(time.perf_counter() - started, 3),
+                "ledger_bytes": os.path.getsize(ledger_path),
+                "operations": {},
+            }
+            print(f"{size} expenses", file=sys.stderr)
+            for name in operations:
+                measures = spawn_operation(name, ledger_path, repeat)
+                entry["operations"][name] = measures
+                print(
+                    f"  {name:<28}p50 {measures['p50_ms']:>10.2f} ms"
+                    f"  p95 {measures['p95_ms']:>10.2f} ms"
+                    f"  rss {measures['peak_rss_mb']:>7.1f} MB",
+                    file=sys.stderr,
+                )
+        report["sizes"][str(size)] = entry
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument(
+        "--operations", nargs="+", choices=list(OPERATIONS), default=list(OPERATIONS)
+    )
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark-report.json")
+    parser.add_argument("--operation", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.operation:
+        print(json.dumps(run_operation(args.operation, args.repeat)))
+        return
+
+    logging.disable(logging.INFO)
+    report = run_suite(args.sizes, args.operations, args.repeat, args.seed)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Startup benchmark: time from process start to the reply of /start.
+
+Every run starts a fresh interpreter that imports the bot (main.py) and answers a
+fake /start update, so the measure includes interpreter start and every import the
+bot needs before it can reply. The "eager" mode also imports the analytics and
+plotting modules first, like the bot did before they were loaded on first use.
+
+Usage: python benchmarks/startup.py [--runs N]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+CHILD = """
+import asyncio
+import sys
+import time
+
+sys.path.insert(0, {src!r})
+for module in {preload!r}:
+    __import__(module)
+
+import main  # noqa: F401
+from config import TELEGRAM_USER_ID
+from handlers import start
+
+
+class Message:
+    async def reply_text(self, text, **kwargs):
+        print(time.time(), flush=True)
+
+
+class User:
+    id = TELEGRAM_USER_ID
+
+
+class Update:
+    message = effective_message = Message()
+    effective_user = User()
+
+
+asyncio.run(start(Update(), None))
+"""
+
+MODES = {
+    "lazy": [],
+    "eager": ["analytics", "charts"],
+}
+
+
+def time_to_first_reply(preload, cwd):
+    """
+    Start a bot process and return the seconds it took to reply to /start.
+    """
+    code = CHILD.format(src=os.path.abspath(SRC_PATH), preload=preload)
+    started = time.time()
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout.split()[-1]) - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as cwd:
+        for mode, preload in MODES.items():
+            # The first run only warms up the OS file cache
+            time_to_first_reply(preload, cwd)
+            results[mode] = [
+                time_to_first_reply(preload, cwd) for _ in range(args.runs)
+            ]
+
+    print(f"{'mode':<8}{'median':>10}{'min':>10}{'max':>10}")
+    for mode, times in results.items():
+        print(
+            f"{mode:<8}{statistics.median(times):>9.3f}s"
+            f"{min(times):>9.3f}s{max(times):>9.3f}s"
+        )
+    speedup = statistics.median(results["eager"]) / statistics.median(results["lazy"])
+    print(f"\nTime to first reply is {speedup:.1f}x faster with lazy imports")
+
+
+if __name__ == "__main__":
+    main()
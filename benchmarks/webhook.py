@@ -0,0 +1,243 @@
+"""
+End-to-end reply latency over a fake Telegram: long polling vs webhook.
+
+A fake Bot API server runs on localhost: it serves getUpdates (long polling) from a
+queue of pending updates, accepts setWebhook/deleteWebhook and records every
+sendMessage. The bot (main.build_application) is pointed at it and started in both
+modes; for each, a "📋 List" message is delivered repeat times, by queueing it for
+getUpdates or by posting it to the bot's webhook listener with the secret token, and
+the latency is the time until the bot's reply reaches the fake server.
+The webhook listener is also checked to reject updates without the secret token.
+
+Usage: python -m benchmarks.webhook [--repeat N] [--output FILE]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+import httpx
+from benchmarks.run import percentile
+from config import TELEGRAM_USER_ID
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "microw", "username": "microw_bot"}
+SECRET_TOKEN = "benchmark-secret"
+
+
+class FakeBotAPI(ThreadingHTTPServer):
+    """
+    Just enough of the Telegram Bot API for the bot to run, on a random local port.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeBotAPIHandler)
+        self.url = f"http://127.0.0.1:{self.server_port}/bot"
+        self.replies = queue.Queue()
+        self._updates = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._condition = threading.Condition()
+
+    def make_update(self, text, user_id=TELEGRAM_USER_ID):
+        """
+        Return a private text message update, as Telegram sends it.
+        """
+        user = {"id": int(user_id), "is_bot": False, "first_name": "Benchmark"}
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(user_id), "type": "private"},
+            "from": user,
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [
+                {"type": "bot_command", "offset": 0, "length": len(text.split()[0])}
+            ]
+        return {"update_id": next(self._update_ids), "message": message}
+
+    def queue_update(self, update):
+        """
+        Queue an update for the next getUpdates call.
+        """
+        with self._condition:
+            self._updates.append(update)
+            self._condition.notify_all()
+
+    def get_updates(self, offset, timeout):
+        """
+        Return the queued updates from offset, waiting up to timeout seconds for one.
+        """
+        with self._condition:
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            if not self._updates:
+                self._condition.wait(timeout)
+            updates, self._updates = self._updates, []
+            return updates
+
+    def call(self, method, params):
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            return self.get_updates(
+                int(params.get("offset") or 0), float(params.get("timeout") or 0)
+            )
+        if method == "sendMessage":
+            self.replies.put((time.perf_counter(), params["chat_id"], params["text"]))
+            return {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(params["chat_id"]), "type": "private"},
+                "from": BOT_USER,
+                "text": params["text"],
+            }
+        # setWebhook, deleteWebhook, setMyCommands...
+        return True
+
+
+class FakeBotAPIHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        method = self.path.rsplit("/", 1)[-1]
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        params = dict(parse_qsl(body.decode()))
+        result = self.server.call(method, params)
+        payload = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def free_port():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BaseHTTPRequestHandler)
+    port = server.server_port
+    server.server_close()
+    return port
+
+
+async def wait_reply(api):
+    """
+    Return the arrival time of the next reply of the bot.
+    """
+    arrived, _, _ = await asyncio.to_thread(api.replies.get, timeout=30)
+    return arrived
+
+
+async def measure(mode, api, repeat):
+    """
+    Start the bot in the given mode, then return the latencies of repeat list requests.
+    """
+    from coordinator import start_coordinators, stop_coordinators
+    from main import build_application, webhook_options
+    from telegram import Update
+
+    application = build_application(base_url=api.url)
+    # Requests follow each other faster than Telegram lets a bot send messages: lift
+    # the rate limits, so they don't set the pace
+    application.bot.rate_limiter.rate = application.bot.rate_limiter.chat_rate = 10**6
+    async with application:
+        await start_coordinators()
+        await application.start()
+        if mode == "polling":
+            await application.updater.start_polling(
+                poll_interval=0, timeout=10, allowed_updates=Update.ALL_TYPES
+            )
+
+            async def deliver(update):
+                api.queue_update(update)
+
+        else:
+            port = free_port()
+            options = webhook_options(f"http://127.0.0.1:{port}/telegram", SECRET_TOKEN)
+            options.update(listen="127.0.0.1", port=port)
+            await application.updater.start_webhook(**options)
+            client = httpx.AsyncClient()
+            headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET_TOKEN}
+
+            async def deliver(update):
+                response = await client.post(
+                    options["webhook_url"], json=update, headers=headers
+                )
+                response.raise_for_status()
+
+            rejected = await client.post(
+                options["webhook_url"], json=api.make_update("/start")
+            )
+            print(
+                f"  update without the secret token: HTTP {rejected.status_code}",
+                file=sys.stderr,
+            )
+
+        await deliver(api.make_update("/start"))
+        await wait_reply(api)
+
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            await deliver(api.make_update("📋 List"))
+            latencies.append(await wait_reply(api) - started)
+
+        if mode == "webhook":
+            await client.aclose()
+        await application.updater.stop()
+        await application.stop()
+        await stop_coordinators()
+
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+    }
+
+
+async def run(repeat):
+    api = FakeBotAPI()
+    threading.Thread(target=api.serve_forever, daemon=True).start()
+    report = {}
+    try:
+        for mode in ("polling", "webhook"):
+            report[mode] = await measure(mode, api, repeat)
+            print(
+                f"{mode:<10}p50 {report[mode]['p50_ms']:>8.2f} ms"
+                f"  p95 {report[mode]['p95_ms']:>8.2f} ms",
+                file=sys.stderr,
+            )
+    finally:
+        api.shutdown()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    # The bot keeps its ledger in the working directory
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        report = asyncio.run(run(args.repeat))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
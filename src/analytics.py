@@ -0,0 +1,48 @@
+import hashlib
+
+import pandas as pd
+from constants import ROLLUP_COLUMNS
+from metrics import metrics
+from storage import get_expense_store
+from users import user_key
+
+# Frames keyed by user and name, each stored with the ledger version it was built from
+_frames = {}
+
+
+def get_rollup_df(user_id=None):
+    """
+    Return the shared (year, month, category, subcategory) aggregate DataFrame of a user,
+    rebuilding it only when the ledger changed. Its size depends on the number of
+    months and categories, not on the number of expenses.
+    """
+    store = get_expense_store(user_id)
+    name = (user_key(user_id), "rollup")
+    cached = _frames.get(name)
+    if cached is not None and cached[0] == store.version:
+        return cached[1]
+
+    version = store.version
+    with metrics.span("dataframe.rollup"):
+        df = pd.DataFrame(store.rollup(), columns=ROLLUP_COLUMNS)
+        df["Price"] = df["Price"].astype(float)
+    _frames[name] = (version, df)
+    return df
+
+
+def get_rollup_digest(user_id=None):
+    """
+    Return a digest of a user's rollup contents, used to address cached charts.
+    """
+    store = get_expense_store(user_id)
+    name = (user_key(user_id), "rollup_digest")
+    cached = _frames.get(name)
+    if cached is not None and cached[0] == store.version:
+        return cached[1]
+
+    version = store.version
+    df = get_rollup_df(user_id)
+    hashed = pd.util.hash_pandas_object(df, index=False).values.tobytes()
+    digest = hashlib.sha256(hashed).hexdigest()
+    _frames[name] = (version, digest)
+    return digest
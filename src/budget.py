@@ -0,0 +1,153 @@
+import os
+import threading
+
+from config import logger
+from constants import BUDGET_PERIODS, LOCAL_BUDGET_PATH, categories
+from coordinator import get_coordinator
+from metrics import metrics
+from openpyxl import Workbook, load_workbook
+from storage import get_expense_store
+from users import UserRegistry, user_path
+
+# Seconds to wait before writing budget changes back, so a burst of changes costs one save
+FLUSH_DELAY = 30
+
+
+class BudgetTable:
+    """
+    Budgets kept in memory as {category: [budget, period]}, the period being one of
+    BUDGET_PERIODS. What was spent in the current period is never stored: it's read from
+    the ledger's weekly and monthly totals, so it follows adds, deletes and imports.
+    Changes are written back to budget.xlsx by `flush`, coalesced by `schedule_flush`.
+    """
+
+    def __init__(self, path=LOCAL_BUDGET_PATH, user_id=None):
+        self.path = path
+        self.user_id = user_id
+        self._lock = threading.Lock()
+        self._budgets = {}
+        self._dirty = False
+        self._flush_timer = None
+        self._load()
+
+    @metrics.timed("workbook.budget_load")
+    def _load(self):
+        """
+        Load budget.xlsx, or start from zero budgets if it's missing.
+        Files of older versions have a running Spent column instead of the Period one:
+        those budgets become monthly.
+        """
+        if not os.path.exists(self.path):
+            self._budgets = {
+                category: [0, BUDGET_PERIODS[0]] for category in categories
+            }
+            return
+
+        wb = load_workbook(self.path, read_only=True)
+        for category, budget, period in wb.active.iter_rows(
+            min_row=2, max_col=3, values_only=True
+        ):
+            if category is not None:
+                if period not in BUDGET_PERIODS:
+                    period = BUDGET_PERIODS[0]
+                    self._dirty = True
+                self._budgets[category] = [budget or 0, period]
+        wb.close()
+
+    def get(self, category):
+        """
+        Get the budget and its period for a given category.
+        """
+        budget, period = self._budgets.get(category, (0, BUDGET_PERIODS[0]))
+        return budget, period
+
+    def spent(self, category):
+        """
+        Get what was spent on a category in the current period of its budget.
+        """
+        _, period = self.get(category)
+        totals = get_expense_store(self.user_id).period_totals(period)
+        return totals.get(category, 0)
+
+    def items(self):
+        """
+        Get the (category, budget, period, spent in the current period) rows of every
+        budget, reading the ledger totals once per period.
+        """
+        with self._lock:
+            budgets = [
+                (category, *values) for category, values in self._budgets.items()
+            ]
+        store = get_expense_store(self.user_id)
+        totals = {
+            period: store.period_totals(period)
+            for period in {period for _, _, period in budgets}
+        }
+        return [
+            (category, budget, period, totals[period].get(category, 0))
+            for category, budget, period in budgets
+        ]
+
+    def set_budget(self, category, budget, period=None):
+        """
+        Set the budget for a given category, and optionally its period.
+        """
+        with self._lock:
+            values = self._budgets.setdefault(category, [0, BUDGET_PERIODS[0]])
+            values[0] = budget
+            if period is not None:
+                values[1] = period
+            self._dirty = True
+        self.schedule_flush()
+
+    def schedule_flush(self):
+        """
+        Write the budgets back after FLUSH_DELAY seconds, unless a write is already pending.
+        """
+        with self._lock:
+            if self._flush_timer is not None:
+                return
+            self._flush_timer = threading.Timer(
+                FLUSH_DELAY,
+                get_coordinator(self.user_id).run_threadsafe,
+                args=(self.flush,),
+            )
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    @metrics.timed("workbook.budget_save")
+    def flush(self):
+        """
+        Write the budgets to budget.xlsx if they changed since the last write.
+        """
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty:
+                return
+            rows = [(category, *values) for category, values in self._budgets.items()]
+            self._dirty = False
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet()
+            ws.append(["Category", "Budget", "Period"])
+            for row in rows:
+                ws.append(list(row))
+            temp_path = f"{self.path}.tmp"
+            wb.save(temp_path)
+            os.replace(temp_path, self.path)
+        except Exception:
+            with self._lock:
+                self._dirty = True
+            raise
+        logger.info(f"Budgets written to {self.path}")
+
+
+_budget_tables = UserRegistry(
+    lambda user_id: BudgetTable(user_path(user_id, LOCAL_BUDGET_PATH), user_id)
+)
+get_budget_table = _budget_tables.get
+get_loaded_budget_tables = _budget_tables.items
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+import threading
+
+from constants import LOCAL_CHART_PATH
+from users import UserRegistry, user_path
+
+
+class ChartCache:
+    """
+    Rendered charts addressed by (chart type, data digest, render options).
+    Keeps the PNG on disk together with the Telegram file_id of its last upload,
+    one entry per chart type, so an unchanged chart is neither rendered nor uploaded again.
+    """
+
+    def __init__(self, path=LOCAL_CHART_PATH):
+        self.path = path
+        self.index_path = os.path.join(path, "cache.json")
+        self._lock = threading.Lock()
+        self._index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as f:
+                self._index = json.load(f)
+
+    @staticmethod
+    def key(chart_type, data_digest, **options):
+        """
+        Return the content address of a chart.
+        """
+        payload = json.dumps([chart_type, data_digest, options], sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def image_path(self, chart_type, key):
+        """
+        Return where the PNG for the given chart key is stored.
+        """
+        return os.path.join(self.path, f"{chart_type}-{key[:16]}.png")
+
+    def has_image(self, chart_type, key):
+        """
+        Check if the PNG for the given chart key was already rendered.
+        """
+        return os.path.exists(self.image_path(chart_type, key))
+
+    def get_file_id(self, chart_type, key):
+        """
+        Return the Telegram file_id of the chart, if it was uploaded with this key.
+        """
+        entry = self._index.get(chart_type)
+        if entry is None or entry["key"] != key:
+            return None
+        return entry.get("file_id")
+
+    def put(self, chart_type, key, file_id=None):
+        """
+        Record the current chart for a chart type, dropping the image of the previous one.
+        """
+        with self._lock:
+            previous = self._index.get(chart_type)
+            if previous is not None and previous["key"] != key:
+                previous_path = self.image_path(chart_type, previous["key"])
+                if os.path.exists(previous_path):
+                    os.remove(previous_path)
+            self._index[chart_type] = {"key": key, "file_id": file_id}
+            os.makedirs(self.path, exist_ok=True)
+            with open(self.index_path, "w") as f:
+                json.dump(self._index, f)
+
+    def forget_file_id(self, chart_type):
+        """
+        Drop the file_id of a chart type, e.g. after Telegram rejected it.
+        """
+        with self._lock:
+            entry = self._index.get(chart_type)
+            if entry is not None:
+                entry["file_id"] = None
+
+
+_chart_caches = UserRegistry(
+    lambda user_id: ChartCache(user_path(user_id, LOCAL_CHART_PATH))
+)
+get_chart_cache = _chart_caches.get
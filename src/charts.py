@@ -2,14 +2,15 @@ import calendar
 
 import matplotlib.pyplot as plt
 import seaborn as sns
-from utils import ensure_charts_path
 
+# Charts run in the render.py worker processes and take the monthly rollup frame
+# (see analytics.get_rollup_df)
 
-async def save_pie_chart(df, filename):
+
+def save_pie_chart(df, filename):
     """
     Generate and save a pie chart of expenses by category.
     """
-    ensure_charts_path()
     expenses_by_category = df.groupby("Category")["Price"].sum().reset_index()
     plt.figure(figsize=(10, 6))
     pie = plt.pie(
@@ -26,12 +27,10 @@ async def save_pie_chart(df, filename):
     plt.close()
 
 
-async def save_trend_chart(df, filename):
+def save_trend_chart(df, filename):
     """
     Generate and save a line chart showing the trend of the top 3 expense categories by month.
     """
-    ensure_charts_path()
-    df["Month"] = df["Date"].dt.month
     top_categories = df.groupby("Category")["Price"].sum().nlargest(3).index
     top_categories_data = df[df["Category"].isin(top_categories)]
     expenses_by_month_category = (
@@ -52,17 +51,15 @@ async def save_trend_chart(df, filename):
     plt.close()
 
 
-async def save_stacked_bar_chart(df, filename):
+def save_stacked_bar_chart(df, filename):
     """
     Generate and save a stacked bar chart of monthly expenses by category.
     """
-    ensure_charts_path()
-    df["Month"] = df["Date"].dt.strftime("%B")
     monthly_expenses = (
         df.groupby(["Month", "Category"])["Price"].sum().unstack().fillna(0)
     )
     months_order = list(calendar.month_name[1:])
-    monthly_expenses = monthly_expenses.reindex(months_order)
+    monthly_expenses = monthly_expenses.reindex(range(1, 13))
     plt.figure(figsize=(12, 8))
     ax = monthly_expenses.plot(kind="bar", stacked=True, width=0.8, zorder=3)
     ax.set_xticklabels(months_order, rotation=45, ha="right")
@@ -74,19 +71,16 @@ async def save_stacked_bar_chart(df, filename):
     plt.close()
 
 
-async def save_heatmap(df, filename):
+def save_heatmap(df, filename):
     """
     Generate and save a heatmap of monthly expense intensity by category.
     """
-    ensure_charts_path()
-    df["Month"] = df["Date"].dt.strftime("%B")
     heatmap_data = df.pivot_table(
         values="Price", index="Category", columns="Month", aggfunc="sum", fill_value=0
     )
-    existing_months = [
-        month for month in calendar.month_name[1:] if month in heatmap_data.columns
+    heatmap_data.columns = [
+        calendar.month_name[month] for month in heatmap_data.columns
     ]
-    heatmap_data = heatmap_data[existing_months]
     plt.figure(figsize=(12, 8))
     sns.heatmap(heatmap_data, fmt=".2f", annot=True, cmap="YlGnBu")
     plt.tight_layout()
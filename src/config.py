@@ -16,5 +16,51 @@ TELEGRAM_USER_ID = env_vars.get("TELEGRAM_USER_ID")
 REMOTE_SPREADSHEET_ID = env_vars.get("REMOTE_SPREADSHEET_ID")
 REMOTE_EXPENSE_SHEET = env_vars.get("REMOTE_EXPENSE_SHEET")
 
+# Other users allowed to use the bot (comma-separated IDs), each with their own ledger
+TELEGRAM_USER_IDS = [
+    user_id.strip()
+    for user_id in (env_vars.get("TELEGRAM_USER_IDS") or "").split(",")
+    if user_id.strip()
+]
+
+# Updates handled at the same time (those of a single user are still handled in order)
+MAX_CONCURRENT_UPDATES = int(env_vars.get("MAX_CONCURRENT_UPDATES") or 16)
+
+# Webhook mode: with WEBHOOK_URL (the public HTTPS URL Telegram posts updates to) the bot
+# listens on WEBHOOK_LISTEN:WEBHOOK_PORT instead of long polling
+WEBHOOK_URL = env_vars.get("WEBHOOK_URL")
+WEBHOOK_LISTEN = env_vars.get("WEBHOOK_LISTEN") or "127.0.0.1"
+WEBHOOK_PORT = int(env_vars.get("WEBHOOK_PORT") or 8443)
+WEBHOOK_SECRET_TOKEN = env_vars.get("WEBHOOK_SECRET_TOKEN")
+WEBHOOK_MAX_CONNECTIONS = int(env_vars.get("WEBHOOK_MAX_CONNECTIONS") or 40)
+
+# Outbound messages: overall and per-chat rates (messages per second), and how long
+# budget alerts are held to be merged with the following ones
+OUTBOUND_MESSAGES_PER_SECOND = float(env_vars.get("OUTBOUND_MESSAGES_PER_SECOND") or 25)
+OUTBOUND_CHAT_MESSAGES_PER_SECOND = float(
+    env_vars.get("OUTBOUND_CHAT_MESSAGES_PER_SECOND") or 1
+)
+ALERT_COALESCE_SECONDS = float(env_vars.get("ALERT_COALESCE_SECONDS") or 2)
+
 # Pagination
 ITEMS_PER_PAGE = 5
+
+# Chart rendering
+CHART_RENDER_WORKERS = int(env_vars.get("CHART_RENDER_WORKERS") or 2)
+CHART_RENDER_TIMEOUT = float(env_vars.get("CHART_RENDER_TIMEOUT") or 30)
+
+# Google Sheets sync
+SYNC_CHUNK_SIZE = int(env_vars.get("SYNC_CHUNK_SIZE") or 500)
+
+# Expense import from documents
+IMPORT_CHUNK_SIZE = int(env_vars.get("IMPORT_CHUNK_SIZE") or 10000)
+
+# Expense export to documents
+EXPORT_CHUNK_SIZE = int(env_vars.get("EXPORT_CHUNK_SIZE") or 10000)
+
+# Ledger compaction (physical removal of deleted expenses)
+LEDGER_COMPACTION_HOURS = float(env_vars.get("LEDGER_COMPACTION_HOURS") or 24)
+
+# Metrics: optional Prometheus text file, rewritten every METRICS_DUMP_SECONDS
+METRICS_PATH = env_vars.get("METRICS_PATH")
+METRICS_DUMP_SECONDS = float(env_vars.get("METRICS_DUMP_SECONDS") or 60)
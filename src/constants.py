@@ -11,12 +11,28 @@ from telegram import ReplyKeyboardMarkup
     CHOOSING_BUDGET,
     CHOOSING_BUDGET_CATEGORY,
     CHOOSING_BUDGET_AMOUNT,
-) = range(9)
+    CHOOSING_BUDGET_PERIOD,
+) = range(10)
 
 LOCAL_BUDGET_PATH = "./spreadsheets/budget.xlsx"
 LOCAL_EXPENSE_PATH = "./spreadsheets/expenses.xlsx"
+LOCAL_LEDGER_PATH = "./spreadsheets/expenses.db"
 LOCAL_CHART_PATH = "./charts"
 LOCAL_SETTINGS_PATH = "./settings.json"
+# Files of the users other than the owner, one directory per user ID
+LOCAL_USERS_PATH = "./users"
+
+# Ledger columns, as found in the .xlsx import/export format
+EXPENSE_HEADERS = ["Month", "Category", "Subcategory", "Price", "Date", "Timestamp"]
+EXPENSE_COLUMNS = ["ID"] + EXPENSE_HEADERS
+ROLLUP_COLUMNS = ["Year", "Month", "Category", "Subcategory", "Price", "Count"]
+
+# Periods a budget can span, the first being the default one
+BUDGET_PERIODS = ["monthly", "weekly", "yearly"]
+
+# Expense buttons of the delete list, e.g. "🔥 #42 01/05/2024 Food/Market: 12.5 €":
+# only the ID is matched, the price may be negative or printed as 1e-05
+EXPENSE_BUTTON_PATTERN = r"^🔥 #(\d+) "
 
 # Define reply keyboard
 reply_keyboard = [
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+
+from config import logger
+from users import ALLOWED_USER_IDS, UserRegistry
+
+
+class StorageCoordinator:
+    """
+    Single writer for the ledger, budget and settings files of a user.
+    Every job submitted with `run` (from the event loop) or `run_threadsafe` (from other
+    threads, e.g. the sync scheduler) is executed one at a time by a writer task, in a
+    worker thread so the event loop is never blocked. Before `start` is called, jobs are
+    serialized with a lock instead.
+    Ledger reads don't need to go through here: SQLite gives each reader a snapshot.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._queue = None
+        self._task = None
+        self._inline_lock = threading.Lock()
+
+    async def start(self):
+        """
+        Start the writer task on the running event loop.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._writer())
+
+    async def stop(self):
+        """
+        Let the writer task finish the queued jobs, then stop it.
+        """
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._loop = None
+
+    async def _writer(self):
+        while True:
+            job = await self._queue.get()
+            if job is None:
+                return
+            func, args, kwargs, future = job
+            try:
+                result = await asyncio.to_thread(func, *args, **kwargs)
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run func(*args, **kwargs) as the only storage job in flight and return its result.
+        """
+        if self._task is None:
+            with self._inline_lock:
+                return func(*args, **kwargs)
+        future = self._loop.create_future()
+        await self._queue.put((func, args, kwargs, future))
+        return await future
+
+    def run_threadsafe(self, func, *args, **kwargs):
+        """
+        Same as `run`, for threads other than the event loop's; blocks until the job is done.
+        """
+        loop = self._loop
+        if loop is None:
+            with self._inline_lock:
+                return func(*args, **kwargs)
+        return asyncio.run_coroutine_threadsafe(
+            self.run(func, *args, **kwargs), loop
+        ).result()
+
+
+# Every user has their own coordinator, so one user's writes never queue behind another's
+_coordinators = UserRegistry(lambda user_id: StorageCoordinator())
+get_coordinator = _coordinators.get
+
+
+async def start_coordinators():
+    """
+    Start the storage writer of every allowed user.
+    """
+    for user_id in ALLOWED_USER_IDS:
+        await get_coordinator(user_id).start()
+    logger.info(f"Storage coordinators started for {len(ALLOWED_USER_IDS)} users")
+
+
+async def stop_coordinators():
+    """
+    Let every storage writer finish its queued jobs, then stop them.
+    """
+    for _, coordinator in _coordinators.items():
+        await coordinator.stop()
@@ -0,0 +1,135 @@
+import csv
+import datetime
+import importlib.util
+
+from config import EXPORT_CHUNK_SIZE
+from constants import EXPENSE_HEADERS
+from metrics import metrics
+from openpyxl import Workbook
+
+EXPORT_FORMATS = ("csv", "xlsx", "parquet")
+EXPORT_USAGE = (
+    "Usage: /export [csv|xlsx|parquet] [from dd/mm/YYYY] [to dd/mm/YYYY]\n"
+    "e.g. /export xlsx from 01/01/2024 to 31/12/2024\n"
+    "(from and to can be left out: the first date starts the range, the second ends it)"
+)
+
+
+def parse_export_args(args):
+    """
+    Parse the /export arguments into (format, start, end), end being exclusive.
+    The format defaults to csv, and missing dates leave the range open. A date follows
+    "from" or "to", or takes the first free of the two.
+    Raise ValueError on anything else.
+    """
+    export_format, start, end = "csv", None, None
+    keyword = None
+    for arg in args:
+        word = arg.lower()
+        if word in EXPORT_FORMATS and keyword is None:
+            export_format = word
+            continue
+        if word in ("from", "to") and keyword is None:
+            keyword = word
+            continue
+        try:
+            date = datetime.datetime.strptime(arg, "%d/%m/%Y")
+        except ValueError:
+            raise ValueError(f"unknown option {arg}") from None
+        if keyword is None:
+            keyword = "from" if start is None else "to"
+        if keyword == "from":
+            if start is not None:
+                raise ValueError("more than one start date")
+            start = date
+        else:
+            if end is not None:
+                raise ValueError("more than one end date")
+            end = date + datetime.timedelta(days=1)
+        keyword = None
+    if keyword is not None:
+        raise ValueError(f"a date must follow {keyword}")
+    if start is not None and end is not None and end <= start:
+        raise ValueError("the end date comes before the start date")
+    if export_format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise ValueError("the parquet format needs pyarrow (pip install pyarrow)")
+    return export_format, start, end
+
+
+def _write_csv(chunks, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPENSE_HEADERS)
+        for rows in chunks:
+            writer.writerows(row[1:] for row in rows)
+
+
+def _write_xlsx(chunks, path):
+    # Write-only workbooks stream their rows to disk instead of keeping the cells
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(EXPENSE_HEADERS)
+    for rows in chunks:
+        for row in rows:
+            ws.append(list(row[1:]))
+    wb.save(path)
+
+
+def _write_parquet(chunks, path):
+    # pyarrow is optional, and only imported for a parquet export
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [
+            ("Month", pa.dictionary(pa.int32(), pa.string())),
+            ("Category", pa.dictionary(pa.int32(), pa.string())),
+            ("Subcategory", pa.dictionary(pa.int32(), pa.string())),
+            ("Price", pa.float64()),
+            ("Date", pa.timestamp("s")),
+            ("Timestamp", pa.timestamp("us")),
+        ]
+    )
+    # Every chunk becomes a row group; the rows hold the dates as days and microseconds
+    # since the epoch, so the typed columns only need a cast
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in chunks:
+            _, months, categories, subcategories, prices, days, timestamps = zip(*rows)
+            table = pa.table(
+                [
+                    pa.array(months, pa.string()).dictionary_encode(),
+                    pa.array(categories, pa.string()).dictionary_encode(),
+                    pa.array(subcategories, pa.string()).dictionary_encode(),
+                    pa.array(prices, pa.float64()),
+                    pc.multiply(pa.array(days, pa.int64()), 86_400).cast(
+                        pa.timestamp("s")
+                    ),
+                    pa.array(timestamps, pa.int64()).cast(pa.timestamp("us")),
+                ],
+                schema=schema,
+            )
+            writer.write_table(table)
+
+
+_WRITERS = {"csv": _write_csv, "xlsx": _write_xlsx, "parquet": _write_parquet}
+
+
+@metrics.timed("export.write")
+def export_expenses(store, path, export_format, start=None, end=None):
+    """
+    Write the expenses recorded in [start, end) to a document of the given format,
+    reading them from the store EXPORT_CHUNK_SIZE at a time. Return how many were written.
+    """
+    written = 0
+    # Parquet keeps the typed dates, so its rows are read with them
+    typed = export_format == "parquet"
+
+    def chunks():
+        nonlocal written
+        for rows in store.iter_after(0, EXPORT_CHUNK_SIZE, start, end, typed):
+            written += len(rows)
+            yield rows
+
+    _WRITERS[export_format](chunks(), path)
+    return written
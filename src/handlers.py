@@ -1,46 +1,49 @@
+import asyncio
 import calendar
 import datetime
-
-import pandas as pd
-from config import ITEMS_PER_PAGE, TELEGRAM_USER_ID, logger
+import math
+import os
+import re
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+
+from budget import get_budget_table
+from chart_cache import get_chart_cache
+from config import ITEMS_PER_PAGE, logger
 from constants import (
+    BUDGET_PERIODS,
     CHOOSING,
     CHOOSING_BUDGET,
     CHOOSING_BUDGET_AMOUNT,
     CHOOSING_BUDGET_CATEGORY,
+    CHOOSING_BUDGET_PERIOD,
     CHOOSING_CATEGORY,
     CHOOSING_CHART,
     CHOOSING_ITEM_TO_DELETE,
     CHOOSING_PRICE,
     CHOOSING_SUBCATEGORY,
-    LOCAL_EXPENSE_PATH,
+    EXPENSE_BUTTON_PATTERN,
     categories,
     markup,
 )
+from coordinator import get_coordinator
+from exporter import EXPORT_USAGE, export_expenses, parse_export_args
+from metrics import metrics
+from render import render_chart
+from settings import get_settings
+from storage import get_expense_store
 from telegram import (
     KeyboardButton,
     ReplyKeyboardMarkup,
     Update,
 )
+from telegram.error import BadRequest, TelegramError
 from telegram.ext import ContextTypes, ConversationHandler
+from users import is_allowed, is_owner
 from utils import (
     build_keyboard,
     check_budget,
-    get_current_budget,
-    get_local_budget_wb,
-    get_local_expense_wb,
     is_local_expense_file_empty,
-    load_settings,
-    save_settings,
-    set_budget,
-    update_spent,
-)
-
-from charts import (
-    save_heatmap,
-    save_pie_chart,
-    save_stacked_bar_chart,
-    save_trend_chart,
 )
 
 
@@ -48,7 +51,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """
     Handle the /start command. Verifies user authorization and presents initial menu.
     """
-    if str(update.effective_user.id) != str(TELEGRAM_USER_ID):
+    if not is_allowed(update.effective_user.id):
         await update.message.reply_text("You're not authorized. ⛔")
         return ConversationHandler.END
     await update.effective_message.reply_text(
@@ -113,30 +116,23 @@ async def save_on_local_spreadsheet(
     """
     try:
         price = float(update.message.text.replace(",", "."))
+        if not math.isfinite(price):
+            raise ValueError("Price must be a finite number")
+
         category = context.user_data["selected_category"]
         subcategory = context.user_data["selected_subcategory"]
+        user_id = update.effective_user.id
 
-        wb, ws = get_local_expense_wb()
-        record_timestamp = datetime.datetime.now().isoformat()
-        ws.append(
-            [
-                datetime.datetime.now().strftime("%B"),
-                category,
-                subcategory,
-                price,
-                datetime.datetime.now().strftime("%d/%m/%Y"),
-                record_timestamp,
-            ]
+        await get_coordinator(user_id).run(
+            get_expense_store(user_id).add, category, subcategory, price
         )
-        wb.save(LOCAL_EXPENSE_PATH)
         await update.message.reply_text(
             f"<b>Expense saved 📌</b>\n\n<b>Category:</b> {category}\n"
             f"<b>Subcategory:</b> {subcategory}\n<b>Price:</b> {price} €",
             parse_mode="HTML",
             reply_markup=markup,
         )
-        update_spent(category, price)
-        await check_budget(category)
+        check_budget(category, user_id)
     except ValueError:
         await update.message.reply_text(
             "Please enter a valid price. 🚨", reply_markup=markup
@@ -149,51 +145,41 @@ async def ask_deleting(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     """
     Prompt user to select an expense to delete if any expenses exist.
     """
-    if is_local_expense_file_empty():
+    if is_local_expense_file_empty(update.effective_user.id):
         await update.message.reply_text(
             "You have not yet registered expenses.", reply_markup=markup
         )
         return CHOOSING
 
-    if "current_page" not in context.user_data:
-        context.user_data["current_page"] = 0
+    # Upper ID bound of each page browsed so far, starting from the newest page
+    context.user_data["page_cursors"] = [None]
 
     return await show_expenses(update, context)
 
 
 async def show_expenses(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """
-    Display paginated list of expenses for deletion.
+    Display paginated list of expenses for deletion, walking back from the newest one.
     """
-    wb, ws = get_local_expense_wb()
-    expenses = pd.DataFrame(ws.values)
-
-    if len(expenses.columns) > 0:
-        expenses.columns = expenses.iloc[0]
-        expenses = expenses[1:]
-
-    num_rows = len(expenses)
-    current_page = context.user_data["current_page"]
-
-    start_index = max(num_rows - (current_page + 1) * ITEMS_PER_PAGE, 0)
-    end_index = min(num_rows - current_page * ITEMS_PER_PAGE, num_rows)
+    page_cursors = context.user_data["page_cursors"]
+    expenses = get_expense_store(update.effective_user.id).page_before(
+        page_cursors[-1], ITEMS_PER_PAGE + 1
+    )
+    has_older = len(expenses) > ITEMS_PER_PAGE
+    expenses = expenses[:ITEMS_PER_PAGE]
 
     expense_buttons = []
-    expense_dict = {}
 
-    for i, (index, row) in enumerate(expenses.iloc[start_index:end_index].iterrows()):
-        button_text = (
-            f"🔥 {row['Date']} {row['Category']}/{row['Subcategory']}: {row['Price']} €"
-        )
+    for expense_id, _, category, subcategory, price, date, _ in reversed(expenses):
+        button_text = f"🔥 #{expense_id} {date} {category}/{subcategory}: {price} €"
         expense_buttons.append([KeyboardButton(button_text)])
-        expense_dict[button_text] = index
-
-    context.user_data["expense_dict"] = expense_dict
+    context.user_data["oldest_expense_id"] = expenses[-1][0] if expenses else None
+    context.user_data["has_older"] = has_older
 
     navigation_buttons = []
-    if start_index > 0:
+    if has_older:
         navigation_buttons.append(KeyboardButton("⬅️ Previous"))
-    if end_index < num_rows:
+    if len(page_cursors) > 1:
         navigation_buttons.append(KeyboardButton("➡️ Next"))
 
     if navigation_buttons:
@@ -211,20 +197,16 @@ async def show_expenses(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
 
 
 async def handle_deletion(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    text = update.message.text
-    expense_dict = context.user_data.get("expense_dict", {})
-    ui_expense_id = expense_dict.get(text)
-    if ui_expense_id is None:
+    # The button carries the expense ID, so it stays valid even if the ledger changed
+    match = re.match(EXPENSE_BUTTON_PATTERN, update.message.text)
+    if match is None:
         await update.message.reply_text(
             "Invalid selection. Please try again.", reply_markup=markup
         )
 
         return CHOOSING
 
-    current_page = context.user_data.get("current_page", 0)
-    actual_expense_id = ui_expense_id + (current_page * ITEMS_PER_PAGE) + 1
-
-    await delete_expense(update, context, actual_expense_id)
+    await delete_expense(update, context, int(match.group(1)))
 
     return CHOOSING
 
@@ -234,10 +216,15 @@ async def handle_pagination(update: Update, context: ContextTypes.DEFAULT_TYPE)
     Handle pagination requests.
     """
     text = update.message.text
+    page_cursors = context.user_data.setdefault("page_cursors", [None])
     if text == "⬅️ Previous":
-        context.user_data["current_page"] += 1
-    elif text == "➡️ Next":
-        context.user_data["current_page"] -= 1
+        # Only move back if the page shown had older expenses after it
+        if not context.user_data.get("has_older"):
+            await update.message.reply_text("There are no older expenses. 🤷")
+        else:
+            page_cursors.append(context.user_data["oldest_expense_id"])
+    elif text == "➡️ Next" and len(page_cursors) > 1:
+        page_cursors.pop()
 
     return await show_expenses(update, context)
 
@@ -245,10 +232,13 @@ async def handle_pagination(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def delete_expense(
     update: Update, context: ContextTypes.DEFAULT_TYPE, expense_id: int
 ) -> int:
-    wb, ws = get_local_expense_wb()
     try:
-        ws.delete_rows(expense_id)
-        wb.save(LOCAL_EXPENSE_PATH)
+        user_id = update.effective_user.id
+        deleted = await get_coordinator(user_id).run(
+            get_expense_store(user_id).delete, expense_id
+        )
+        if deleted is None:
+            raise KeyError(f"expense {expense_id} not found")
         await update.message.reply_text(
             "Expense deleted successfully. ✅", reply_markup=markup
         )
@@ -287,9 +277,9 @@ async def ask_budget_category(
     return CHOOSING_BUDGET_CATEGORY
 
 
-async def ask_budget_amount(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+async def ask_budget_period(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """
-    Store the selected budget category and prompt the user to enter the budget amount.
+    Store the selected budget category and prompt the user to select the budget period.
     """
     selected_category = update.message.text
     context.user_data["budget_category"] = selected_category
@@ -297,10 +287,32 @@ async def ask_budget_amount(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if selected_category not in categories:
         return await handle_unexpected_message(update, context)
 
-    current_budget = get_current_budget(selected_category)
+    period_options = [period.capitalize() for period in BUDGET_PERIODS]
+    reply_markup = build_keyboard(period_options, buttons_per_row=3)
+    await update.message.reply_text(
+        f"Select the period of the budget for {selected_category}:",
+        reply_markup=reply_markup,
+    )
+    return CHOOSING_BUDGET_PERIOD
+
+
+async def ask_budget_amount(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """
+    Store the selected budget period and prompt the user to enter the budget amount.
+    """
+    selected_period = update.message.text.lower()
+    context.user_data["budget_period"] = selected_period
+
+    if selected_period not in BUDGET_PERIODS:
+        return await handle_unexpected_message(update, context)
+
+    category = context.user_data["budget_category"]
+    current_budget, current_period = get_budget_table(update.effective_user.id).get(
+        category
+    )
 
     await update.message.reply_text(
-        f"Enter the budget amount for {selected_category}. \n(Current budget: {current_budget} €)"
+        f"Enter the {selected_period} budget amount for {category}. \n(Current budget: {current_budget} € {current_period})"
     )
     return CHOOSING_BUDGET_AMOUNT
 
@@ -315,9 +327,10 @@ async def save_budget(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
             raise ValueError("Budget must be greater than 0")
 
         category = context.user_data["budget_category"]
-        set_budget(category, budget)
+        period = context.user_data["budget_period"]
+        get_budget_table(update.effective_user.id).set_budget(category, budget, period)
         await update.message.reply_text(
-            f"Budget set for {category}: {budget} €", reply_markup=markup
+            f"Budget set for {category}: {budget} € {period}", reply_markup=markup
         )
     except ValueError:
         await update.message.reply_text(
@@ -329,19 +342,14 @@ async def save_budget(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
 
 async def show_budget(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """
-    Show all budgets and spent amounts for all categories.
+    Show all budgets and the amounts spent in their current period.
     """
-    wb, ws = get_local_budget_wb()
-    budgets = []
-
-    for row in ws.iter_rows(min_row=2, max_col=3, values_only=True):
-        category, budget, spent = row
-        budgets.append((category, budget, spent))
+    budgets = get_budget_table(update.effective_user.id).items()
 
     if budgets:
         message = "Here are your budgets:\n\n"
-        for category, budget, spent in budgets:
-            message += f"<b>Category:</b> {category}\n<b>Budget:</b> {budget} €\n<b>Spent:</b> {spent} €\n\n"
+        for category, budget, period, spent in budgets:
+            message += f"<b>Category:</b> {category}\n<b>Budget:</b> {budget} € {period}\n<b>Spent this {period.removesuffix('ly')}:</b> {spent} €\n\n"
     else:
         message = "No budgets set."
 
@@ -350,6 +358,49 @@ async def show_budget(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     return CHOOSING
 
 
+async def import_expenses(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """
+    Import the expenses of a .csv or .xlsx document (Date, Category, Subcategory and
+    Price columns) in a single ledger write, and reply with what was rejected.
+    """
+    # pandas is only imported once a document is sent
+    from importer import read_expenses
+
+    document = update.message.document
+    await update.message.reply_text("Importing your expenses... ⏳")
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, os.path.basename(document.file_name))
+            file = await document.get_file()
+            await file.download_to_drive(path)
+            rows, rejected = await asyncio.to_thread(read_expenses, path)
+    except (ValueError, OSError) as e:
+        logger.error(f"Import failed: {e}")
+        await update.message.reply_text(
+            f"I couldn't read this file: {e} 🚨", reply_markup=markup
+        )
+        return CHOOSING
+
+    user_id = update.effective_user.id
+    if rows:
+        await get_coordinator(user_id).run(get_expense_store(user_id).add_rows, rows)
+
+    for category in dict.fromkeys(category for _, category, _, _, _, _ in rows):
+        check_budget(category, user_id)
+
+    message = f"<b>Imported {len(rows)} expenses ✅</b>"
+    if rejected:
+        message += f"\n\nRejected {sum(map(len, rejected.values()))} rows:"
+        for reason, lines in rejected.items():
+            sample = ", ".join(map(str, lines[:5])) + (
+                ", ..." if len(lines) > 5 else ""
+            )
+            message += f"\n  - {reason}: {len(lines)} (lines {sample})"
+    await update.message.reply_text(message, parse_mode="HTML", reply_markup=markup)
+
+    return CHOOSING
+
+
 async def ask_charts(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """
     Display options for generating different expense charts.
@@ -362,100 +413,121 @@ async def ask_charts(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return CHOOSING_CHART
 
 
+async def reply_with_chart(update: Update, chart, columns, chart_type, intro, caption):
+    """
+    Send a chart, reusing the Telegram file_id of an identical chart sent before.
+    Charts that were never sent are rendered in the rendering process pool, by the name
+    of their function in charts.py, from the given columns of the monthly rollup.
+    """
+    # pandas is only imported once a chart is requested
+    from analytics import get_rollup_df, get_rollup_digest
+
+    user_id = update.effective_user.id
+    chart_cache = get_chart_cache(user_id)
+    key = chart_cache.key(chart_type, get_rollup_digest(user_id))
+    file_id = chart_cache.get_file_id(chart_type, key)
+
+    if file_id is not None:
+        await update.message.reply_text(intro)
+        try:
+            await update.message.reply_photo(
+                file_id, caption=caption, reply_markup=markup
+            )
+            return
+        except BadRequest as e:
+            logger.warning(f"Cached {chart_type} chart rejected, uploading it: {e}")
+            chart_cache.forget_file_id(chart_type)
+
+    filename = chart_cache.image_path(chart_type, key)
+    if not chart_cache.has_image(chart_type, key):
+        try:
+            await render_chart(chart, get_rollup_df(user_id)[columns], filename)
+        except asyncio.TimeoutError:
+            logger.error(f"Rendering {chart_type} timed out")
+            await update.message.reply_text(
+                "The chart is taking too long, please try again later. 🚨",
+                reply_markup=markup,
+            )
+            return
+        except BrokenProcessPool:
+            logger.error(f"Rendering {chart_type} failed, the rendering pool broke")
+            await update.message.reply_text(
+                "The chart couldn't be drawn, please try again later. 🚨",
+                reply_markup=markup,
+            )
+            return
+
+    if file_id is None:
+        await update.message.reply_text(intro)
+    with open(filename, "rb") as photo:
+        message = await update.message.reply_photo(
+            photo, caption=caption, reply_markup=markup
+        )
+    chart_cache.put(chart_type, key, message.photo[-1].file_id)
+
+
 async def show_yearly_chart(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    if is_local_expense_file_empty():
+    if is_local_expense_file_empty(update.effective_user.id):
         await update.message.reply_text(
             "You have not yet registered expenses.", reply_markup=markup
         )
         return CHOOSING
 
-    wb, ws = get_local_expense_wb()
-    values = pd.DataFrame(ws.values)
-    if len(values.columns) > 0:
-        values.columns = values.iloc[0]
-        values = values[1:]
-    df = pd.DataFrame(values, columns=values.columns)
-    df["Price"] = df["Price"].astype(float)
-    df["Date"] = pd.to_datetime(df["Date"], format="%d/%m/%Y")
-
-    await save_pie_chart(df, "charts/expense_by_category_by_year.png")
-    await update.message.reply_text("Yay! Your yearly chart is ready:")
-    await update.message.reply_photo(
-        open("charts/expense_by_category_by_year.png", "rb"),
-        caption="Expense by category (yearly)",
-        reply_markup=markup,
+    await reply_with_chart(
+        update,
+        "save_pie_chart",
+        ["Category", "Price"],
+        "expense_by_category_by_year",
+        "Yay! Your yearly chart is ready:",
+        "Expense by category (yearly)",
     )
     return CHOOSING
 
 
 async def show_trend_chart(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    if is_local_expense_file_empty():
+    if is_local_expense_file_empty(update.effective_user.id):
         await update.message.reply_text("You have not yet registered expenses.")
         return CHOOSING
 
-    wb, ws = get_local_expense_wb()
-    values = pd.DataFrame(ws.values)
-    if len(values.columns) > 0:
-        values.columns = values.iloc[0]
-        values = values[1:]
-    df = pd.DataFrame(values, columns=values.columns)
-    df["Price"] = df["Price"].astype(float)
-    df["Date"] = pd.to_datetime(df["Date"], format="%d/%m/%Y")
-
-    await save_trend_chart(df, "charts/expense_trend_top_categories_by_month.png")
-    await update.message.reply_text("Yay! Your trend chart is ready:")
-    await update.message.reply_photo(
-        open("charts/expense_trend_top_categories_by_month.png", "rb"),
-        caption="Trend top 3 categories (monthly)",
-        reply_markup=markup,
+    await reply_with_chart(
+        update,
+        "save_trend_chart",
+        ["Month", "Category", "Price"],
+        "expense_trend_top_categories_by_month",
+        "Yay! Your trend chart is ready:",
+        "Trend top 3 categories (monthly)",
     )
     return CHOOSING
 
 
 async def show_monthly_chart(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    if is_local_expense_file_empty():
+    if is_local_expense_file_empty(update.effective_user.id):
         await update.message.reply_text("You have not yet registered expenses.")
         return CHOOSING
 
-    wb, ws = get_local_expense_wb()
-    values = pd.DataFrame(ws.values)
-    if len(values.columns) > 0:
-        values.columns = values.iloc[0]
-        values = values[1:]
-    df = pd.DataFrame(values, columns=values.columns)
-    df["Price"] = df["Price"].astype(float)
-    df["Date"] = pd.to_datetime(df["Date"], format="%d/%m/%Y")
-
-    await save_stacked_bar_chart(df, "charts/monthly_expenses_by_category.png")
-    await update.message.reply_text("Yay! Your monthly chart is ready:")
-    await update.message.reply_photo(
-        open("charts/monthly_expenses_by_category.png", "rb"),
-        caption="Expense by category (monthly)",
-        reply_markup=markup,
+    await reply_with_chart(
+        update,
+        "save_stacked_bar_chart",
+        ["Month", "Category", "Price"],
+        "monthly_expenses_by_category",
+        "Yay! Your monthly chart is ready:",
+        "Expense by category (monthly)",
     )
     return CHOOSING
 
 
 async def show_heatmap_chart(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    if is_local_expense_file_empty():
+    if is_local_expense_file_empty(update.effective_user.id):
         await update.message.reply_text("You have not yet registered expenses.")
         return CHOOSING
 
-    wb, ws = get_local_expense_wb()
-    values = pd.DataFrame(ws.values)
-    if len(values.columns) > 0:
-        values.columns = values.iloc[0]
-        values = values[1:]
-    df = pd.DataFrame(values, columns=values.columns)
-    df["Price"] = df["Price"].astype(float)
-    df["Date"] = pd.to_datetime(df["Date"], format="%d/%m/%Y")
-
-    await save_heatmap(df, "charts/heatmap_expense_intensity.png")
-    await update.message.reply_text("Yay! Your heatmap is ready:")
-    await update.message.reply_photo(
-        open("charts/heatmap_expense_intensity.png", "rb"),
-        caption="Heatmap of expense intensity (monthly)",
-        reply_markup=markup,
+    await reply_with_chart(
+        update,
+        "save_heatmap",
+        ["Month", "Category", "Price"],
+        "heatmap_expense_intensity",
+        "Yay! Your heatmap is ready:",
+        "Heatmap of expense intensity (monthly)",
     )
     return CHOOSING
 
@@ -464,35 +536,24 @@ async def make_list(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """
     Generate and send a summary list of expenses for the current year.
     """
-    wb, ws = get_local_expense_wb()
-    values = pd.DataFrame(ws.values)
-
-    if len(values.columns) > 0:
-        values.columns = values.iloc[0]
-        values = values[1:]
-
-    df = pd.DataFrame(values, columns=values.columns)
-    df["Price"] = df["Price"].astype(float)
-    df["Date"] = pd.to_datetime(df["Date"], format="%d/%m/%Y")
-
     current_year = datetime.datetime.now().year
-    df_current_year = df[df["Date"].dt.year == current_year]
 
-    message = ""
-    grouped = df_current_year.groupby([df_current_year["Date"].dt.month, "Category"])[
-        "Price"
-    ].sum()
-    total_per_month = df_current_year.groupby(df_current_year["Date"].dt.month)[
-        "Price"
-    ].sum()
+    # Plain sums over the rollup rows, so the list doesn't need pandas
+    grouped = {}
+    for _, month, category, _, total, _ in get_expense_store(
+        update.effective_user.id
+    ).rollup(current_year):
+        by_category = grouped.setdefault(month, {})
+        by_category[category] = by_category.get(category, 0) + total
 
+    message = ""
     for month in range(1, datetime.datetime.now().month + 1):
         month_name = calendar.month_name[month]
         message += f"\n<b>{month_name}:</b>\n"
-        if month in grouped.index.get_level_values(0):
-            for category, amount in grouped[month].items():
-                message += f"  - {category}: {amount:.2f} €\n"
-        total = total_per_month.get(month, 0)
+        by_category = grouped.get(month, {})
+        for category in sorted(by_category):
+            message += f"  - {category}: {by_category[category]:.2f} €\n"
+        total = sum(by_category.values())
         message += f"  <b>Total:</b> {total:.2f} €\n"
     await update.message.reply_text(message, parse_mode="HTML")
 
@@ -502,8 +563,11 @@ async def make_list(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 async def ask_settings(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """
     Present the current Google Sheets synchronization status and provide options to enable/disable it.
+    Only the owner's ledger is synced to the Google Sheet, so other users only get the
+    budget notifications.
     """
-    settings = load_settings()
+    owner = is_owner(update.effective_user.id)
+    settings = get_settings(update.effective_user.id).snapshot()
     google_sync_status = "enabled" if settings["google_sync"]["enabled"] else "disabled"
     google_sync_button_text = (
         "Disable Google Sheet sync"
@@ -519,12 +583,16 @@ async def ask_settings(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
         else "Enable budget notification"
     )
 
-    settings_options = [google_sync_button_text, budget_notification_button_text]
-    reply_markup = build_keyboard(settings_options, buttons_per_row=2)
+    settings_options = [budget_notification_button_text]
     message = (
-        f"- Google Sheets sync is currently <u>{google_sync_status}</u>.\n"
         f"- Budget notifications are currently <u>{budget_notification_status}</u>.\n"
     )
+    if owner:
+        settings_options.insert(0, google_sync_button_text)
+        message = (
+            f"- Google Sheets sync is currently <u>{google_sync_status}</u>.\n{message}"
+        )
+    reply_markup = build_keyboard(settings_options, buttons_per_row=2)
     await update.message.reply_text(
         message, reply_markup=reply_markup, parse_mode="HTML"
     )
@@ -535,26 +603,116 @@ async def handle_settings_choice(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> int:
     text = update.message.text
-    settings = load_settings()
 
     if "Enable Google Sheet sync" in text:
-        settings["google_sync"]["enabled"] = True
+        section, enabled = "google_sync", True
         message = "Google Sheets synchronization is now enabled."
     elif "Disable Google Sheet sync" in text:
-        settings["google_sync"]["enabled"] = False
+        section, enabled = "google_sync", False
         message = "Google Sheets synchronization is now disabled."
     elif "Enable budget notification" in text:
-        settings["budget_notifications"]["enabled"] = True
+        section, enabled = "budget_notifications", True
         message = "Budget notifications are now enabled."
     elif "Disable budget notification" in text:
-        settings["budget_notifications"]["enabled"] = False
+        section, enabled = "budget_notifications", False
         message = "Budget notifications are now disabled."
 
-    save_settings(settings)
+    user_id = update.effective_user.id
+    if section == "google_sync" and not is_owner(user_id):
+        await update.message.reply_text(
+            "Google Sheets sync is only available to the owner. ⛔",
+            reply_markup=markup,
+        )
+        return CHOOSING
+
+    await get_coordinator(user_id).run(
+        get_settings(user_id).update, section, enabled=enabled
+    )
     await update.message.reply_text(message, reply_markup=markup)
     return CHOOSING
 
 
+async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Handle the /stats command: show the latency of handlers and storage operations.
+    """
+    if not is_owner(update.effective_user.id):
+        await update.message.reply_text("You're not authorized. ⛔")
+        return
+
+    rows = metrics.summary()
+    if not rows:
+        await update.message.reply_text("No stats collected yet.")
+        return
+
+    def bound(seconds):
+        return "> 10 s" if math.isinf(seconds) else f"≤ {seconds * 1000:g} ms"
+
+    message = "<b>Stats since start</b>\n"
+    for name, calls, mean, p50, p95, errors, read, written in rows:
+        message += (
+            f"\n<b>{name}</b>: {calls} calls, avg {mean * 1000:.1f} ms, "
+            f"p50 {bound(p50)}, p95 {bound(p95)}"
+        )
+        if read or written:
+            message += f", I/O {read / 1024:.1f}/{written / 1024:.1f} KB read/written"
+        if errors:
+            message += f", {errors} errors"
+    await update.message.reply_text(message, parse_mode="HTML")
+
+
+async def export_ledger(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Handle the /export command: send the expenses of a date range as a CSV, XLSX or
+    Parquet document, streamed from the ledger chunk by chunk.
+    """
+    if not is_allowed(update.effective_user.id):
+        await update.message.reply_text("You're not authorized. ⛔")
+        return
+
+    try:
+        export_format, start, end = parse_export_args(context.args or [])
+    except ValueError as e:
+        await update.message.reply_text(f"{e} 🚨\n\n{EXPORT_USAGE}")
+        return
+
+    bounds = []
+    if start is not None:
+        bounds.append(f"from {start:%d-%m-%Y}")
+    if end is not None:
+        bounds.append(f"to {end - datetime.timedelta(days=1):%d-%m-%Y}")
+    period = " ".join(bounds) or "all"
+    filename = f"expenses-{period.replace(' ', '-')}.{export_format}"
+
+    await update.message.reply_text("Exporting your expenses... ⏳")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, filename)
+        written = await asyncio.to_thread(
+            export_expenses,
+            get_expense_store(update.effective_user.id),
+            path,
+            export_format,
+            start,
+            end,
+        )
+        if not written:
+            await update.message.reply_text("No expenses to export. 🤷")
+            return
+        try:
+            with open(path, "rb") as f:
+                await update.message.reply_document(
+                    document=f,
+                    filename=filename,
+                    caption=f"{written} expenses ({period}) 📤",
+                )
+        except TelegramError as e:
+            logger.error(f"Export upload failed: {e}")
+            await update.message.reply_text(
+                f"I couldn't send the export: {e} 🚨\n"
+                "Try a shorter date range or the parquet format."
+            )
+
+
 async def fallback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """
     Clear user data and restart the conversation flow.
@@ -0,0 +1,152 @@
+import csv
+import zipfile
+
+import pandas as pd
+from config import IMPORT_CHUNK_SIZE
+from constants import categories
+from metrics import metrics
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+# Columns an imported document must have (Timestamp is optional)
+IMPORT_COLUMNS = ["Date", "Category", "Subcategory", "Price"]
+
+# Reasons a row can be rejected for, in the order they are checked
+REJECT_DATE = "invalid date"
+REJECT_CATEGORY = "unknown category/subcategory"
+REJECT_PRICE = "invalid price"
+
+_VALID_PAIRS = pd.MultiIndex.from_tuples(
+    [
+        (category, subcategory)
+        for category, subcategories in categories.items()
+        for subcategory in subcategories
+    ]
+)
+
+
+def _read_csv_chunks(path, chunk_size):
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        sample = f.read(4096)
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=",;\t").delimiter
+    except csv.Error:
+        delimiter = ","
+    yield from pd.read_csv(
+        path,
+        sep=delimiter,
+        dtype=str,
+        chunksize=chunk_size,
+        skipinitialspace=True,
+        encoding="utf-8-sig",
+    )
+
+
+def _read_xlsx_chunks(path, chunk_size):
+    try:
+        wb = load_workbook(path, read_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+        # Not a zip, or a zip that isn't a workbook (e.g. a renamed file)
+        raise ValueError("not a valid .xlsx document") from e
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [
+            str(value).strip() if value is not None else "" for value in next(rows, ())
+        ]
+        chunk = []
+        for row in rows:
+            chunk.append(row[: len(header)])
+            if len(chunk) == chunk_size:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        wb.close()
+
+
+def read_chunks(path, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Yield the rows of a .csv or .xlsx document as DataFrames of at most chunk_size rows.
+    """
+    if path.lower().endswith(".xlsx"):
+        return _read_xlsx_chunks(path, chunk_size)
+    return _read_csv_chunks(path, chunk_size)
+
+
+def _parse_dates(values):
+    """
+    Parse ledger (dd/mm/YYYY) or ISO dates, and date cells; NaT where it's not a date.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    text = values.astype(str).str.strip()
+    dates = pd.to_datetime(text, format="%d/%m/%Y", errors="coerce")
+    missing = dates.isna()
+    if missing.any():
+        dates[missing] = pd.to_datetime(
+            text[missing], format="ISO8601", errors="coerce"
+        )
+    return dates
+
+
+def validate_chunk(df):
+    """
+    Split a chunk into ledger rows (shaped as EXPENSE_HEADERS) and a Series with the
+    reject reason of every other row.
+    """
+    df = df.rename(columns=lambda column: str(column).strip().capitalize())
+    missing = [column for column in IMPORT_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"missing columns: {', '.join(missing)}")
+
+    dates = _parse_dates(df["Date"])
+    category = df["Category"].astype(str).str.strip()
+    subcategory = df["Subcategory"].astype(str).str.strip()
+    prices = pd.to_numeric(
+        df["Price"].astype(str).str.strip().str.replace(",", ".", regex=False),
+        errors="coerce",
+    )
+    if "Timestamp" in df.columns:
+        timestamps = pd.to_datetime(df["Timestamp"], format="ISO8601", errors="coerce")
+        timestamps = timestamps.fillna(dates)
+    else:
+        timestamps = dates
+
+    known = pd.MultiIndex.from_arrays([category, subcategory]).isin(_VALID_PAIRS)
+    reasons = pd.Series(None, index=df.index, dtype=object)
+    # NaN and infinite prices both fail the comparison
+    reasons[~prices.abs().lt(float("inf")).to_numpy()] = REJECT_PRICE
+    reasons[~known] = REJECT_CATEGORY
+    reasons[dates.isna().to_numpy()] = REJECT_DATE
+
+    accepted = reasons.isna().to_numpy()
+    rows = list(
+        zip(
+            dates[accepted].dt.strftime("%B"),
+            category[accepted],
+            subcategory[accepted],
+            prices[accepted].astype(float),
+            dates[accepted].dt.strftime("%d/%m/%Y"),
+            timestamps[accepted].dt.strftime("%Y-%m-%dT%H:%M:%S"),
+        )
+    )
+    return rows, reasons[~accepted]
+
+
+@metrics.timed("import.parse")
+def read_expenses(path, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Read and validate a .csv or .xlsx document of expenses, chunk by chunk.
+    Return the accepted ledger rows and {reason: [line numbers]} for the rejected ones.
+    """
+    accepted, rejected = [], {}
+    first_line = 2
+    for chunk in read_chunks(path, chunk_size):
+        chunk.index = range(first_line, first_line + len(chunk))
+        rows, reasons = validate_chunk(chunk)
+        accepted.extend(rows)
+        for line, reason in reasons.items():
+            rejected.setdefault(reason, []).append(line)
+        first_line += len(chunk)
+    return accepted, rejected
@@ -1,40 +1,66 @@
-from config import TELEGRAM_BOT_TOKEN
+import asyncio
+import contextlib
+import importlib
+import secrets
+from urllib.parse import urlparse
+
+from budget import get_loaded_budget_tables
+from config import (
+    MAX_CONCURRENT_UPDATES,
+    TELEGRAM_BOT_TOKEN,
+    WEBHOOK_LISTEN,
+    WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_URL,
+    logger,
+)
 from constants import (
     CHOOSING,
     CHOOSING_BUDGET,
     CHOOSING_BUDGET_AMOUNT,
     CHOOSING_BUDGET_CATEGORY,
+    CHOOSING_BUDGET_PERIOD,
     CHOOSING_CATEGORY,
     CHOOSING_CHART,
     CHOOSING_ITEM_TO_DELETE,
     CHOOSING_PRICE,
     CHOOSING_SUBCATEGORY,
+    EXPENSE_BUTTON_PATTERN,
 )
+from coordinator import get_coordinator, start_coordinators, stop_coordinators
 from handlers import (
     ask_budget,
     ask_budget_amount,
     ask_budget_category,
+    ask_budget_period,
     ask_category,
     ask_charts,
     ask_deleting,
     ask_price,
     ask_settings,
     ask_subcategory,
+    export_ledger,
     fallback,
     handle_deletion,
     handle_pagination,
     handle_settings_choice,
     handle_unexpected_message,
+    import_expenses,
     make_list,
     save_budget,
     save_on_local_spreadsheet,
     show_budget,
     show_heatmap_chart,
     show_monthly_chart,
+    show_stats,
     show_trend_chart,
     show_yearly_chart,
     start,
 )
+from metrics import instrument, instrument_conversation
+from outbox import OutboundRateLimiter, outbox
+from render import shutdown_render_executor, start_render_executor
 from sync import start_scheduler
 from telegram import Update
 from telegram.ext import (
@@ -44,14 +70,78 @@ from telegram.ext import (
     MessageHandler,
     filters,
 )
+from users import PerUserUpdateProcessor
 
+# Warm up started by post_init, cancelled at shutdown if it's still running
+_prewarm_task = None
 
-def main() -> None:
+
+async def prewarm() -> None:
     """
-    Main function to start the bot.
-    Initializes the application, sets up conversation handlers, and starts polling.
+    Import the analytics stack and start the chart rendering workers in the background,
+    so the bot answers right away and the first chart doesn't wait for pandas/matplotlib.
+    """
+    try:
+        await asyncio.to_thread(importlib.import_module, "analytics")
+        await start_render_executor()
+    except Exception as e:
+        # Charts still load on first use
+        logger.error(f"Charts warm up failed: {e}")
+
+
+async def post_init(application: Application) -> None:
+    """
+    Start the storage writers and the alert outbox once the application is initialized,
+    and the warm up of the charts without waiting for it.
+    """
+    global _prewarm_task
+    await start_coordinators()
+    outbox.start(application.bot)
+    # The application isn't running yet, so its create_task would leave the task alone
+    _prewarm_task = asyncio.get_running_loop().create_task(prewarm())
+
+
+async def post_stop(application: Application) -> None:
+    """
+    Send the pending alerts while the bot can still reach Telegram.
+    """
+    await outbox.stop()
+
+
+async def post_shutdown(application: Application) -> None:
+    """
+    Stop the charts warm up if it's still running and the chart rendering workers,
+    write back the budgets and flush the pending storage jobs.
+    """
+    if _prewarm_task is not None and not _prewarm_task.done():
+        _prewarm_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _prewarm_task
+    shutdown_render_executor()
+    for user_id, budget_table in get_loaded_budget_tables():
+        await get_coordinator(user_id).run(budget_table.flush)
+    await stop_coordinators()
+
+
+def build_application(base_url=None) -> Application:
     """
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    Initialize the application and set up the conversation handlers.
+    Updates of different users are handled concurrently, those of a user in order, and
+    the messages sent to Telegram are rate limited.
+    base_url replaces the Telegram Bot API URL (e.g. for a local Bot API server).
+    """
+    builder = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .concurrent_updates(PerUserUpdateProcessor(MAX_CONCURRENT_UPDATES))
+        .rate_limiter(OutboundRateLimiter())
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+    )
+    if base_url is not None:
+        builder = builder.base_url(base_url)
+    application = builder.build()
 
     conv_handler = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
@@ -77,6 +167,11 @@ def main() -> None:
                     filters.Regex("^Disable budget notification$"),
                     handle_settings_choice,
                 ),
+                MessageHandler(
+                    filters.Document.FileExtension("csv")
+                    | filters.Document.FileExtension("xlsx"),
+                    import_expenses,
+                ),
                 MessageHandler(
                     filters.TEXT & ~filters.COMMAND, handle_unexpected_message
                 ),
@@ -93,12 +188,7 @@ def main() -> None:
                 )
             ],
             CHOOSING_ITEM_TO_DELETE: [
-                MessageHandler(
-                    filters.Regex(
-                        r"^🔥 \d{2}/\d{2}/\d{4} [\w\s]+/[\w\s]+: (\d+(?:,\d{2})?) €$"
-                    ),
-                    handle_deletion,
-                ),
+                MessageHandler(filters.Regex(EXPENSE_BUTTON_PATTERN), handle_deletion),
                 MessageHandler(
                     filters.Regex("^(⬅️ Previous|➡️ Next)$"), handle_pagination
                 ),
@@ -123,6 +213,12 @@ def main() -> None:
                 ),
             ],
             CHOOSING_BUDGET_CATEGORY: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, ask_budget_period),
+                MessageHandler(
+                    filters.TEXT & ~filters.COMMAND, handle_unexpected_message
+                ),
+            ],
+            CHOOSING_BUDGET_PERIOD: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, ask_budget_amount),
                 MessageHandler(
                     filters.TEXT & ~filters.COMMAND, handle_unexpected_message
@@ -135,8 +231,45 @@ def main() -> None:
         fallbacks=[MessageHandler(filters.Regex("^/cancel$"), fallback)],
     )
 
+    instrument_conversation(conv_handler)
     application.add_handler(conv_handler)
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    application.add_handler(CommandHandler("stats", instrument(show_stats)))
+    application.add_handler(CommandHandler("export", instrument(export_ledger)))
+    return application
+
+
+def webhook_options(webhook_url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET_TOKEN) -> dict:
+    """
+    Return the options of the webhook listener: it listens on WEBHOOK_LISTEN:WEBHOOK_PORT
+    for the path of webhook_url, where Telegram is told to post the updates.
+    Without a secret token a random one is used, so only Telegram knows it.
+    """
+    return {
+        "listen": WEBHOOK_LISTEN,
+        "port": WEBHOOK_PORT,
+        "url_path": urlparse(webhook_url).path.lstrip("/"),
+        "webhook_url": webhook_url,
+        "secret_token": secret_token or secrets.token_urlsafe(32),
+        "max_connections": WEBHOOK_MAX_CONNECTIONS,
+        "allowed_updates": Update.ALL_TYPES,
+    }
+
+
+def main() -> None:
+    """
+    Main function to start the bot.
+    Receives the updates through a webhook if WEBHOOK_URL is set, by long polling otherwise.
+    """
+    application = build_application()
+    if WEBHOOK_URL:
+        options = webhook_options()
+        logger.info(
+            f"Listening for updates on {options['listen']}:{options['port']}"
+            f"/{options['url_path']}"
+        )
+        application.run_webhook(**options)
+    else:
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 
 if __name__ == "__main__":
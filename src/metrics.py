@@ -0,0 +1,200 @@
+import bisect
+import functools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (in seconds) of the latency histogram buckets, plus an implicit +Inf one
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def read_io():
+    """
+    Return the (read, written) bytes of this process so far, or (0, 0) if unknown.
+    Counts read/write syscalls (from /proc/self/io), so it's only available on Linux.
+    """
+    try:
+        with open("/proc/self/io", "r") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+    except OSError:
+        return 0, 0
+    return int(counters["rchar"]), int(counters["wchar"])
+
+
+class Metrics:
+    """
+    In-process latency histograms and counters, keyed by span name
+    (e.g. "handler.make_list", "chart.render", "sheets.append_rows").
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name, seconds):
+        """
+        Record a duration for a span.
+        """
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = [[0] * (len(BUCKETS) + 1), 0.0]
+            histogram[0][bisect.bisect_left(BUCKETS, seconds)] += 1
+            histogram[1] += seconds
+
+    def increment(self, counter, name, value=1):
+        """
+        Add value to a counter of a span (e.g. "errors" or "read_bytes").
+        """
+        with self._lock:
+            key = (counter, name)
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @contextmanager
+    def span(self, name, io=False):
+        """
+        Time the enclosed block as the given span, counting its errors and, with io,
+        the bytes the process read and wrote meanwhile.
+        """
+        if io:
+            read_before, write_before = read_io()
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.increment("errors", name)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started)
+            if io:
+                read_after, write_after = read_io()
+                self.increment("read_bytes", name, read_after - read_before)
+                self.increment("write_bytes", name, write_after - write_before)
+
+    def timed(self, name):
+        """
+        Decorator recording every call of a function as the given span.
+        """
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def summary(self):
+        """
+        Return (name, calls, mean seconds, p50 bound, p95 bound, errors, bytes read,
+        bytes written) for every span, the byte counts being 0 for spans without io.
+        Percentiles are the upper bound of the histogram bucket they fall in.
+        """
+        with self._lock:
+            histograms = {
+                name: (list(buckets), total)
+                for name, (buckets, total) in self._histograms.items()
+            }
+            counters = dict(self._counters)
+
+        rows = []
+        for name, (buckets, total) in sorted(histograms.items()):
+            calls = sum(buckets)
+            rows.append(
+                (
+                    name,
+                    calls,
+                    total / calls,
+                    _quantile_bound(buckets, 0.5),
+                    _quantile_bound(buckets, 0.95),
+                    counters.get(("errors", name), 0),
+                    counters.get(("read_bytes", name), 0),
+                    counters.get(("write_bytes", name), 0),
+                )
+            )
+        return rows
+
+    def to_prometheus(self):
+        """
+        Render every histogram and counter in the Prometheus text format.
+        """
+        with self._lock:
+            histograms = {
+                name: (list(buckets), total)
+                for name, (buckets, total) in self._histograms.items()
+            }
+            counters = dict(self._counters)
+
+        lines = ["# TYPE microw_span_seconds histogram"]
+        for name, (buckets, total) in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS + (math.inf,), buckets):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(float(bound))
+                lines.append(
+                    f'microw_span_seconds_bucket{{span="{name}",le="{le}"}} {cumulative}'
+                )
+            lines.append(f'microw_span_seconds_sum{{span="{name}"}} {total}')
+            lines.append(f'microw_span_seconds_count{{span="{name}"}} {cumulative}')
+
+        for counter in sorted({counter for counter, _ in counters}):
+            lines.append(f"# TYPE microw_span_{counter}_total counter")
+            for (other, name), value in sorted(counters.items()):
+                if other == counter:
+                    lines.append(
+                        f'microw_span_{counter}_total{{span="{name}"}} {value}'
+                    )
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        Dump the metrics to a Prometheus text file (e.g. for node_exporter's textfile
+        collector), replacing it atomically.
+        """
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(temp_path, path)
+
+
+def _quantile_bound(buckets, q):
+    rank = q * sum(buckets)
+    cumulative = 0
+    for bound, count in zip(BUCKETS + (math.inf,), buckets):
+        cumulative += count
+        if cumulative >= rank:
+            return bound
+    return math.inf
+
+
+metrics = Metrics()
+
+
+def instrument(callback):
+    """
+    Wrap a handler callback so every update it handles is recorded as a span.
+    """
+    name = f"handler.{callback.__name__}"
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        with metrics.span(name, io=True):
+            return await callback(update, context)
+
+    return wrapper
+
+
+def instrument_conversation(conversation):
+    """
+    Instrument the callbacks of every handler of a ConversationHandler.
+    """
+    handlers = list(conversation.entry_points) + list(conversation.fallbacks)
+    for state_handlers in conversation.states.values():
+        handlers.extend(state_handlers)
+    for handler in handlers:
+        handler.callback = instrument(handler.callback)
@@ -0,0 +1,188 @@
+import asyncio
+import time
+
+from config import (
+    ALERT_COALESCE_SECONDS,
+    OUTBOUND_CHAT_MESSAGES_PER_SECOND,
+    OUTBOUND_MESSAGES_PER_SECOND,
+    logger,
+)
+from metrics import metrics
+from telegram.error import RetryAfter, TelegramError
+from telegram.ext import BaseRateLimiter
+
+# Messages a chat can receive at once before its rate applies
+CHAT_BURST = 5
+# Times a request is retried when Telegram answers with a retry_after
+MAX_RETRIES = 3
+
+
+class TokenBucket:
+    """
+    Let through rate acquisitions per second on average, and bursts of up to capacity.
+    Waiters are served in the order they arrived.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def is_full(self):
+        self._refill()
+        return self._tokens >= self.capacity
+
+    async def acquire(self):
+        """
+        Take a token, waiting for one if the bucket is empty.
+        """
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class OutboundRateLimiter(BaseRateLimiter):
+    """
+    Rate limiter of every request the application's bot makes to a chat (replies,
+    alerts...), so bursts stay below Telegram's flood limits: a token bucket for all
+    chats together and one per chat. Requests without a chat (e.g. getUpdates) are
+    not limited.
+    When Telegram still answers with a retry_after, every request waits for it to
+    elapse and the request is retried, up to MAX_RETRIES times (or rate_limit_args).
+    """
+
+    def __init__(
+        self,
+        rate=OUTBOUND_MESSAGES_PER_SECOND,
+        chat_rate=OUTBOUND_CHAT_MESSAGES_PER_SECOND,
+    ):
+        self.rate = rate
+        self.chat_rate = chat_rate
+        self._bucket = None
+        self._chat_buckets = {}
+        self._paused_until = 0
+
+    async def initialize(self):
+        self._bucket = TokenBucket(self.rate, max(self.rate, 1))
+        self._chat_buckets = {}
+
+    async def shutdown(self):
+        pass
+
+    def _chat_bucket(self, chat_id):
+        # Forget the chats that have been quiet long enough to have a full bucket
+        if len(self._chat_buckets) > 512:
+            for other, bucket in list(self._chat_buckets.items()):
+                if other != chat_id and bucket.is_full():
+                    del self._chat_buckets[other]
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(
+                self.chat_rate, CHAT_BURST
+            )
+        return bucket
+
+    async def process_request(
+        self, callback, args, kwargs, endpoint, data, rate_limit_args
+    ):
+        chat_id = data.get("chat_id")
+        if chat_id is None:
+            return await callback(*args, **kwargs)
+
+        max_retries = rate_limit_args or MAX_RETRIES
+        with metrics.span(f"telegram.{endpoint}"):
+            for attempt in range(max_retries + 1):
+                await self._chat_bucket(str(chat_id)).acquire()
+                await self._bucket.acquire()
+                delay = self._paused_until - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                try:
+                    return await callback(*args, **kwargs)
+                except RetryAfter as e:
+                    if attempt == max_retries:
+                        raise
+                    retry_after = float(e.retry_after)
+                    logger.warning(f"Flood limit hit, retrying in {retry_after} s")
+                    metrics.increment("retries", f"telegram.{endpoint}")
+                    self._paused_until = max(
+                        self._paused_until, time.monotonic() + retry_after
+                    )
+
+
+class Outbox:
+    """
+    Budget alerts waiting to be sent by the application's bot.
+    Alerts for a chat are held for ALERT_COALESCE_SECONDS after the first one, then
+    sent together as a single message; a newer alert with the same key (e.g. for the
+    same category) replaces the pending one.
+    """
+
+    def __init__(self, delay=ALERT_COALESCE_SECONDS):
+        self.delay = delay
+        self._bot = None
+        # {chat ID: {key: text}}
+        self._pending = {}
+        self._flush_tasks = {}
+        self._stopping = asyncio.Event()
+
+    def start(self, bot):
+        """
+        Send the alerts with the given bot from now on.
+        """
+        self._bot = bot
+        self._stopping.clear()
+
+    async def stop(self):
+        """
+        Send every pending alert right away.
+        """
+        self._stopping.set()
+        await asyncio.gather(*list(self._flush_tasks.values()))
+        self._bot = None
+
+    def alert(self, chat_id, key, text):
+        """
+        Queue an alert for a chat. Must be called from the event loop.
+        """
+        if self._bot is None:
+            logger.warning(f"Outbox not started, alert to {chat_id} dropped")
+            return
+        self._pending.setdefault(chat_id, {})[key] = text
+        if chat_id not in self._flush_tasks:
+            self._flush_tasks[chat_id] = asyncio.get_running_loop().create_task(
+                self._flush_later(chat_id)
+            )
+
+    async def _flush_later(self, chat_id):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), self.delay)
+        except asyncio.TimeoutError:
+            pass
+        await self._flush(chat_id)
+
+    async def _flush(self, chat_id):
+        self._flush_tasks.pop(chat_id, None)
+        alerts = self._pending.pop(chat_id, None)
+        if not alerts:
+            return
+        text = "Alert ⚠️\n\n" + "\n\n".join(alerts.values())
+        try:
+            await self._bot.send_message(chat_id=chat_id, text=text, parse_mode="HTML")
+        except TelegramError as e:
+            logger.error(f"Alert to {chat_id} not sent: {e}")
+
+
+outbox = Outbox()
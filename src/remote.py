@@ -0,0 +1,78 @@
+import threading
+
+import gspread
+from config import REMOTE_EXPENSE_SHEET, REMOTE_SPREADSHEET_ID, logger
+from google.auth.exceptions import RefreshError, TransportError
+from metrics import metrics
+from requests.exceptions import ConnectionError
+
+# API status codes worth a fresh session and a second attempt
+RECONNECT_STATUS_CODES = {401, 500, 502, 503, 504}
+
+
+class RemoteSheetClient:
+    """
+    Long-lived handle on a Google Sheets worksheet.
+    The authorized session (with its HTTP connection pool) and the worksheet metadata
+    are fetched once and reused; google-auth only refreshes the token when it expires.
+    """
+
+    def __init__(self, spreadsheet_id, worksheet_name, credentials="credentials.json"):
+        self.spreadsheet_id = spreadsheet_id
+        self.worksheet_name = worksheet_name
+        self.credentials = credentials
+        self._lock = threading.Lock()
+        self._client = None
+        self._worksheet = None
+
+    def worksheet(self):
+        """
+        Return the worksheet, authenticating and resolving it on first use.
+        """
+        with self._lock:
+            if self._client is None:
+                self._client = gspread.service_account(filename=self.credentials)
+            if self._worksheet is None:
+                self._worksheet = self._client.open_by_key(
+                    self.spreadsheet_id
+                ).worksheet(self.worksheet_name)
+            return self._worksheet
+
+    def reconnect(self):
+        """
+        Drop the session and the worksheet handle, so the next call starts afresh.
+        """
+        with self._lock:
+            if self._client is not None:
+                self._client.http_client.session.close()
+            self._client = None
+            self._worksheet = None
+
+    def call(self, method, *args, **kwargs):
+        """
+        Call a worksheet method, reconnecting and retrying once on connection or auth errors.
+        """
+        with metrics.span(f"sheets.{method}"):
+            return self._call(method, *args, **kwargs)
+
+    def _call(self, method, *args, **kwargs):
+        try:
+            return getattr(self.worksheet(), method)(*args, **kwargs)
+        except gspread.exceptions.APIError as e:
+            if e.code not in RECONNECT_STATUS_CODES:
+                raise
+            logger.warning(f"Google Sheets API error {e.code}, reconnecting")
+        except (ConnectionError, TransportError, RefreshError) as e:
+            logger.warning(f"Google Sheets connection lost ({e}), reconnecting")
+        self.reconnect()
+        return getattr(self.worksheet(), method)(*args, **kwargs)
+
+
+_remote_expense_sheet = RemoteSheetClient(REMOTE_SPREADSHEET_ID, REMOTE_EXPENSE_SHEET)
+
+
+def get_remote_expense_sheet():
+    """
+    Return the shared client for the remote expense worksheet.
+    """
+    return _remote_expense_sheet
@@ -0,0 +1,104 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config import CHART_RENDER_TIMEOUT, CHART_RENDER_WORKERS, logger
+from metrics import metrics
+
+_executor = None
+
+
+def _warm_up():
+    """
+    Import the plotting stack once per worker, so no chart pays for it.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+    import charts  # noqa: F401
+
+
+def _ping():
+    return True
+
+
+def _render(chart, df, filename):
+    import charts
+
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    getattr(charts, chart)(df, filename)
+
+
+def get_render_executor():
+    """
+    Return the process pool used to render charts, creating it on first use.
+    Workers are spawned (not forked) so they don't inherit the bot's threads and sockets.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=CHART_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_up,
+        )
+    return _executor
+
+
+async def start_render_executor():
+    """
+    Start every rendering worker up front, so the first chart request doesn't wait for
+    matplotlib to be imported.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_render_executor()
+    await asyncio.gather(
+        *(loop.run_in_executor(executor, _ping) for _ in range(CHART_RENDER_WORKERS))
+    )
+    logger.info(f"Chart rendering pool ready with {CHART_RENDER_WORKERS} workers")
+
+
+def shutdown_render_executor():
+    """
+    Stop the rendering workers.
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _discard_render_executor(executor):
+    """
+    Stop a broken rendering pool, so the next chart starts a new one (unless another
+    request already did).
+    """
+    global _executor
+    executor.shutdown(wait=False, cancel_futures=True)
+    if _executor is executor:
+        _executor = None
+
+
+async def render_chart(chart, df, filename):
+    """
+    Run the chart function of charts.py named chart in the rendering pool without
+    blocking the event loop (the bot process itself never imports matplotlib).
+    If a worker died (e.g. killed when out of memory), the chart is rendered once more
+    in a new pool.
+    Raises asyncio.TimeoutError after CHART_RENDER_TIMEOUT seconds, and
+    BrokenProcessPool if the new pool breaks too.
+    """
+    loop = asyncio.get_running_loop()
+    with metrics.span("chart.render"):
+        for attempt in range(2):
+            executor = get_render_executor()
+            try:
+                future = loop.run_in_executor(executor, _render, chart, df, filename)
+                return await asyncio.wait_for(future, timeout=CHART_RENDER_TIMEOUT)
+            except BrokenProcessPool:
+                logger.error("Chart rendering pool broken, starting a new one")
+                _discard_render_executor(executor)
+                if attempt:
+                    raise
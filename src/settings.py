@@ -0,0 +1,113 @@
+import copy
+import json
+import os
+import threading
+
+from config import logger
+from constants import LOCAL_SETTINGS_PATH
+from users import UserRegistry, user_path
+
+DEFAULT_SETTINGS = {
+    "google_sync": {"enabled": False, "cursor": 0},
+    "budget_notifications": {"enabled": False},
+}
+
+
+class SettingsManager:
+    """
+    Settings held in memory.
+    The file is read and migrated once; afterwards it is only written when a value actually
+    changes, atomically, and subscribers are told about the change instead of re-reading it.
+    """
+
+    def __init__(self, path=LOCAL_SETTINGS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._settings = {}
+        self._load()
+
+    def _load(self):
+        """
+        Read the settings file, filling in missing sections and keys with the defaults.
+        """
+        settings = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                settings = json.load(f)
+        migrated = copy.deepcopy(settings)
+
+        # Older versions tracked the sync with a timestamp: the sync job converts it
+        google_sync = migrated.get("google_sync", {})
+        if "cursor" not in google_sync and google_sync.get("last_upload"):
+            google_sync["cursor"] = None
+
+        for section, defaults in DEFAULT_SETTINGS.items():
+            values = migrated.setdefault(section, {})
+            for key, value in defaults.items():
+                values.setdefault(key, value)
+            values["enabled"] = bool(values["enabled"])
+
+        self._settings = migrated
+        if migrated != settings:
+            self._write()
+            logger.info(f"Settings initialized in {self.path}")
+
+    def _write(self):
+        """
+        Write the settings to a temporary file and move it over the settings file.
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self._settings, f)
+        os.replace(temp_path, self.path)
+
+    def get(self, section):
+        """
+        Return a copy of a settings section.
+        """
+        with self._lock:
+            return dict(self._settings[section])
+
+    def snapshot(self):
+        """
+        Return a copy of all the settings.
+        """
+        with self._lock:
+            return copy.deepcopy(self._settings)
+
+    def update(self, section, **values):
+        """
+        Change some values of a settings section, saving and notifying only if they changed.
+        """
+        with self._lock:
+            current = self._settings[section]
+            changes = {
+                key: value for key, value in values.items() if current.get(key) != value
+            }
+            if not changes:
+                return False
+            current.update(changes)
+            self._write()
+            subscribers = list(self._subscribers)
+
+        for callback in subscribers:
+            try:
+                callback(section, changes)
+            except Exception as e:
+                logger.error(f"Settings subscriber failed: {e}")
+        return True
+
+    def subscribe(self, callback):
+        """
+        Call callback(section, changes) after every change.
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+
+_settings = UserRegistry(
+    lambda user_id: SettingsManager(user_path(user_id, LOCAL_SETTINGS_PATH))
+)
+get_settings = _settings.get
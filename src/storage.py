@@ -0,0 +1,795 @@
+import datetime
+import math
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+from config import logger
+from constants import EXPENSE_HEADERS, LOCAL_EXPENSE_PATH, LOCAL_LEDGER_PATH
+from metrics import metrics
+from openpyxl import load_workbook
+from users import UserRegistry, user_path
+
+_COLUMNS = "id, month, category, subcategory, price, date, timestamp"
+# Same, with the date and timestamp as days and microseconds since the epoch
+_TYPED_COLUMNS = "id, month, category, subcategory, price, day, ts"
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+# Expenses are stored in one table per year (the year of their date), listed with the
+# range of IDs they hold in the partitions table; IDs come from a single sequence.
+# Next to the ledger text, the date and timestamp are stored as numbers (day and ts,
+# naive like the text), computed once on write: reads filter and convert them without
+# parsing any text
+_PARTITION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id INTEGER PRIMARY KEY,
+    month TEXT NOT NULL,
+    category TEXT NOT NULL,
+    subcategory TEXT NOT NULL,
+    price REAL NOT NULL,
+    date TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    day INTEGER,
+    ts INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_{table}_ts ON {table} (ts);
+CREATE INDEX IF NOT EXISTS idx_{table}_deleted ON {table} (id) WHERE deleted = 1;
+"""
+
+
+def _partition_table(year):
+    return f"expenses_{int(year)}"
+
+
+def _create_partition(conn, year):
+    """
+    Create the table of a year partition, inside the current transaction.
+    """
+    for statement in _PARTITION_SCHEMA.format(table=_partition_table(year)).split(";"):
+        if statement.strip():
+            conn.execute(statement)
+
+
+def _partition_by_year(conn):
+    """
+    Move the expenses of the single expenses table into year partitions.
+    """
+    conn.execute(
+        "CREATE TABLE partitions (year INTEGER PRIMARY KEY, "
+        "min_id INTEGER NOT NULL, max_id INTEGER NOT NULL)"
+    )
+    conn.execute("CREATE TABLE sequence (last_id INTEGER NOT NULL)")
+    conn.execute(
+        "INSERT INTO sequence SELECT COALESCE("
+        "(SELECT seq FROM sqlite_sequence WHERE name = 'expenses'), 0)"
+    )
+    years = conn.execute(
+        "SELECT DISTINCT CAST(substr(date, 7, 4) AS INTEGER) FROM expenses"
+    ).fetchall()
+    for (year,) in years:
+        table = _partition_table(year)
+        _create_partition(conn, year)
+        conn.execute(
+            f"INSERT INTO {table} ({_COLUMNS}, deleted) "
+            f"SELECT {_COLUMNS}, deleted FROM expenses "
+            "WHERE CAST(substr(date, 7, 4) AS INTEGER) = ?",
+            (year,),
+        )
+        conn.execute(
+            f"INSERT INTO partitions SELECT ?, MIN(id), MAX(id) FROM {table}", (year,)
+        )
+    conn.execute("DROP TABLE expenses")
+
+
+def _add_weekly_rollup(conn):
+    """
+    Create the weekly totals per category and fill them from the year partitions.
+    """
+    conn.execute(
+        "CREATE TABLE weekly_rollup (week TEXT NOT NULL, category TEXT NOT NULL, "
+        "total REAL NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (week, category))"
+    )
+    years = [year for year, in conn.execute("SELECT year FROM partitions")]
+    if not years:
+        return
+    # A week can span two years, so the partitions are grouped together
+    union = " UNION ALL ".join(
+        f"SELECT category, price, date FROM {_partition_table(year)} WHERE deleted = 0"
+        for year in years
+    )
+    conn.execute(
+        "INSERT INTO weekly_rollup "
+        "SELECT date(substr(date, 7, 4) || '-' || substr(date, 4, 2) || '-' || "
+        "substr(date, 1, 2), 'weekday 0', '-6 days'), category, SUM(price), COUNT(*) "
+        f"FROM ({union}) GROUP BY 1, 2"
+    )
+
+
+def _add_typed_dates(conn):
+    """
+    Store the date and timestamp of every expense as numbers, and index the timestamps
+    as numbers instead of text.
+    """
+    for (year,) in conn.execute("SELECT year FROM partitions").fetchall():
+        table = _partition_table(year)
+        # Partitions made by the previous migration already have the columns
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for column in ("day", "ts"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER")
+        rows = conn.execute(f"SELECT id, date, timestamp FROM {table}").fetchall()
+        conn.executemany(
+            f"UPDATE {table} SET day = ?, ts = ? WHERE id = ?",
+            (
+                (*_typed_dates(date, timestamp), expense_id)
+                for expense_id, date, timestamp in rows
+            ),
+        )
+        conn.execute(f"DROP INDEX IF EXISTS idx_{table}_timestamp")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_ts ON {table} (ts)")
+
+
+# Each entry upgrades the schema by one version (tracked with PRAGMA user_version):
+# either an SQL script or a function taking the connection
+_MIGRATIONS = [
+    """
+    CREATE TABLE expenses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        month TEXT NOT NULL,
+        category TEXT NOT NULL,
+        subcategory TEXT NOT NULL,
+        price REAL NOT NULL,
+        date TEXT NOT NULL,
+        timestamp TEXT NOT NULL
+    );
+    CREATE INDEX idx_expenses_timestamp ON expenses (timestamp);
+    """,
+    """
+    CREATE TABLE rollup (
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        subcategory TEXT NOT NULL,
+        total REAL NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (year, month, category, subcategory)
+    );
+    INSERT INTO rollup
+    SELECT CAST(substr(date, 7, 4) AS INTEGER), CAST(substr(date, 4, 2) AS INTEGER),
+           category, subcategory, SUM(price), COUNT(*)
+    FROM expenses GROUP BY 1, 2, 3, 4;
+    """,
+    """
+    ALTER TABLE expenses ADD COLUMN deleted INTEGER NOT NULL DEFAULT 0;
+    CREATE INDEX idx_expenses_deleted ON expenses (id) WHERE deleted = 1;
+    """,
+    _partition_by_year,
+    _add_weekly_rollup,
+    _add_typed_dates,
+]
+
+_INSERT_EXPENSE = (
+    "INSERT INTO {table} "
+    "(id, month, category, subcategory, price, date, timestamp, day, ts) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_PARTITION_EXTEND = (
+    "INSERT INTO partitions (year, min_id, max_id) VALUES (?, ?, ?) "
+    "ON CONFLICT (year) DO UPDATE SET "
+    "min_id = MIN(min_id, excluded.min_id), max_id = MAX(max_id, excluded.max_id)"
+)
+_ROLLUP_ADD = (
+    "INSERT INTO rollup (year, month, category, subcategory, total, count) "
+    "VALUES (?, ?, ?, ?, ?, 1) "
+    "ON CONFLICT (year, month, category, subcategory) "
+    "DO UPDATE SET total = total + excluded.total, count = count + 1"
+)
+_ROLLUP_REMOVE = (
+    "UPDATE rollup SET total = total - ?, count = count - 1 "
+    "WHERE year = ? AND month = ? AND category = ? AND subcategory = ?"
+)
+_ROLLUP_PRUNE = (
+    "DELETE FROM rollup WHERE year = ? AND month = ? AND category = ? "
+    "AND subcategory = ? AND count <= 0"
+)
+_WEEKLY_ROLLUP_ADD = (
+    "INSERT INTO weekly_rollup (week, category, total, count) VALUES (?, ?, ?, 1) "
+    "ON CONFLICT (week, category) "
+    "DO UPDATE SET total = total + excluded.total, count = count + 1"
+)
+_WEEKLY_ROLLUP_REMOVE = (
+    "UPDATE weekly_rollup SET total = total - ?, count = count - 1 "
+    "WHERE week = ? AND category = ?"
+)
+_WEEKLY_ROLLUP_PRUNE = (
+    "DELETE FROM weekly_rollup WHERE week = ? AND category = ? AND count <= 0"
+)
+
+
+def _micros(when):
+    """
+    Return the microseconds since the epoch of a naive datetime.
+    """
+    return (when - _EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def _typed_dates(date, timestamp):
+    """
+    Return (days, microseconds) since the epoch for the dd/mm/YYYY date and the ISO
+    timestamp of a ledger row. A timestamp that can't be read counts as the start of
+    the date.
+    """
+    day = datetime.date(int(date[6:10]), int(date[3:5]), int(date[0:2]))
+    days = (day - _EPOCH.date()).days
+    try:
+        when = datetime.datetime.fromisoformat(str(timestamp)).replace(tzinfo=None)
+    except ValueError:
+        return days, days * 86_400_000_000
+    return days, _micros(when)
+
+
+def _rollup_key(day):
+    """
+    Return (year, month) for a number of days since the epoch.
+    """
+    date = _EPOCH.date() + datetime.timedelta(days=day)
+    return date.year, date.month
+
+
+def _week_key(day):
+    """
+    Return the ISO date of the Monday starting the week of a number of days since the
+    epoch.
+    """
+    date = _EPOCH.date() + datetime.timedelta(days=day)
+    return (date - datetime.timedelta(days=date.weekday())).isoformat()
+
+
+class ExpenseStore(ABC):
+    """
+    Storage engine interface for the expense ledger.
+    Rows are tuples ordered as ID followed by EXPENSE_HEADERS.
+    `version` changes on every write, so readers can key caches on it.
+    """
+
+    version = 0
+
+    @abstractmethod
+    def add(self, category, subcategory, price, when=None):
+        """
+        Append an expense and return its ID.
+        """
+
+    @abstractmethod
+    def add_rows(self, rows):
+        """
+        Append rows already shaped as EXPENSE_HEADERS in a single transaction.
+        """
+
+    @abstractmethod
+    def delete(self, expense_id):
+        """
+        Delete the expense with the given ID and return its (category, subcategory,
+        price, date), or None if it does not exist.
+        """
+
+    @abstractmethod
+    def compact(self):
+        """
+        Physically drop deleted expenses and return how many were dropped.
+        """
+
+    @abstractmethod
+    def query(self, start=None, end=None, category=None):
+        """
+        Return the expenses recorded in [start, end), optionally for a single category.
+        """
+
+    @abstractmethod
+    def count(self):
+        """
+        Return the number of expenses in the ledger.
+        """
+
+    @abstractmethod
+    def deleted_ids(self):
+        """
+        Return the IDs of the deleted expenses that were not compacted yet.
+        """
+
+    @abstractmethod
+    def last_id(self):
+        """
+        Return the highest expense ID ever assigned (0 for an empty ledger).
+        IDs only grow, so they can be used as a cursor over the ledger.
+        """
+
+    @abstractmethod
+    def page_before(self, expense_id, limit):
+        """
+        Return at most limit expenses with an ID below expense_id (or the newest ones if
+        expense_id is None), newest first.
+        """
+
+    @abstractmethod
+    def iter_after(self, expense_id, batch_size, start=None, end=None, typed=False):
+        """
+        Yield lists of at most batch_size expenses with an ID above expense_id, in ID order,
+        optionally only those recorded in [start, end).
+        With typed, rows hold the date and timestamp as days and microseconds since the
+        epoch instead of text.
+        """
+
+    @abstractmethod
+    def last_id_before(self, timestamp):
+        """
+        Return the highest ID among expenses recorded up to the given datetime.
+        """
+
+    @abstractmethod
+    def rollup(self, year=None):
+        """
+        Return (year, month, category, subcategory, total, count) aggregates.
+        """
+
+    @abstractmethod
+    def period_totals(self, period, day=None):
+        """
+        Return {category: total} for the "weekly", "monthly" or "yearly" period holding
+        day (today by default); weeks start on Monday.
+        """
+
+    @abstractmethod
+    def close(self):
+        """
+        Close the connections to the ledger.
+        """
+
+
+class SQLiteExpenseStore(ExpenseStore):
+    """
+    Expense ledger backed by SQLite in WAL mode, so appends don't rewrite history.
+    Writes go through a single locked connection; every thread reads through its own
+    connection, so readers see a consistent snapshot and never wait for the writer.
+    Deletes only mark the row as deleted (every read skips those rows); `compact`
+    removes them later in bulk. IDs are never reused.
+    Expenses are partitioned by year: writes go to the partition of their year and
+    reads only open the partitions that can hold the requested range.
+    Monthly (per subcategory) and weekly (per category) totals are kept up to date in
+    the same transaction as every add and delete.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._local = threading.local()
+        self._readers = []
+        self._migrate()
+        self._load_partitions()
+
+    def _reader(self):
+        """
+        Return the read connection of the calling thread.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            self._local.conn = conn
+            with self._lock:
+                self._readers.append(conn)
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Run a write transaction on the writer connection and bump the version on commit.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            self.version += 1
+
+    def _migrate(self):
+        """
+        Bring the database schema up to date.
+        """
+        with self._lock:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            for target, migration in enumerate(
+                _MIGRATIONS[version:], start=version + 1
+            ):
+                if callable(migration):
+                    self._conn.execute("BEGIN")
+                    try:
+                        migration(self._conn)
+                        self._conn.execute(f"PRAGMA user_version = {target}")
+                    except Exception:
+                        self._conn.execute("ROLLBACK")
+                        raise
+                    self._conn.execute("COMMIT")
+                else:
+                    self._conn.executescript(
+                        f"BEGIN; {migration} PRAGMA user_version = {target}; COMMIT;"
+                    )
+                logger.info(f"Ledger schema migrated to version {target}")
+
+    def _load_partitions(self):
+        """
+        Read the partition manifest: {year: (min_id, max_id)}.
+        """
+        rows = self._conn.execute("SELECT year, min_id, max_id FROM partitions")
+        self._partitions = {year: (min_id, max_id) for year, min_id, max_id in rows}
+
+    def _years(self, start=None, end=None):
+        """
+        Return the years of the partitions that may hold expenses in [start, end).
+        """
+        years = sorted(self._partitions)
+        if start is not None:
+            years = [year for year in years if year >= start.year]
+        if end is not None:
+            last = (end - datetime.timedelta(microseconds=1)).year
+            years = [year for year in years if year <= last]
+        return years
+
+    def _select(self, sql, years, params=(), suffix=""):
+        """
+        Run sql (with a {table} placeholder) on each of the given partitions and
+        return the rows of their union, sorted and limited by suffix.
+        """
+        if not years:
+            return []
+        union = " UNION ALL ".join(
+            sql.format(table=_partition_table(year)) for year in years
+        )
+        return (
+            self._reader()
+            .execute(f"{union} {suffix}", tuple(params) * len(years))
+            .fetchall()
+        )
+
+    def _insert(self, conn, rows):
+        """
+        Insert rows shaped as EXPENSE_HEADERS into their year partitions, assigning
+        them the next IDs, and return the first one.
+        """
+        last_id = conn.execute(
+            "UPDATE sequence SET last_id = last_id + ? RETURNING last_id", (len(rows),)
+        ).fetchone()[0]
+        first_id = last_id - len(rows) + 1
+
+        # The typed dates are computed once here, and the aggregates keyed on them
+        typed_rows = [
+            (expense_id, *row, *_typed_dates(row[4], row[5]))
+            for expense_id, row in enumerate(rows, start=first_id)
+        ]
+        by_year = {}
+        for row in typed_rows:
+            by_year.setdefault(_rollup_key(row[7])[0], []).append(row)
+        for year, year_rows in by_year.items():
+            if year not in self._partitions:
+                _create_partition(conn, year)
+            conn.executemany(
+                _INSERT_EXPENSE.format(table=_partition_table(year)), year_rows
+            )
+            conn.execute(_PARTITION_EXTEND, (year, year_rows[0][0], year_rows[-1][0]))
+        conn.executemany(
+            _ROLLUP_ADD,
+            (
+                (*_rollup_key(day), category, subcategory, price)
+                for _, _, category, subcategory, price, _, _, day, _ in typed_rows
+            ),
+        )
+        conn.executemany(
+            _WEEKLY_ROLLUP_ADD,
+            (
+                (_week_key(day), category, price)
+                for _, _, category, _, price, _, _, day, _ in typed_rows
+            ),
+        )
+        return first_id
+
+    @contextmanager
+    def _partitioned_transaction(self):
+        """
+        Same as `_transaction`, reloading the partition manifest once committed (or
+        rolled back).
+        """
+        try:
+            with self._transaction() as conn:
+                yield conn
+        finally:
+            with self._lock:
+                self._load_partitions()
+
+    @metrics.timed("ledger.add")
+    def add(self, category, subcategory, price, when=None):
+        when = when or datetime.datetime.now()
+        row = (
+            when.strftime("%B"),
+            category,
+            subcategory,
+            float(price),
+            when.strftime("%d/%m/%Y"),
+            when.isoformat(),
+        )
+        with self._partitioned_transaction() as conn:
+            return self._insert(conn, [row])
+
+    def add_rows(self, rows):
+        rows = list(rows)
+        if rows:
+            with self._partitioned_transaction() as conn:
+                self._insert(conn, rows)
+
+    @metrics.timed("ledger.delete")
+    def delete(self, expense_id):
+        years = [
+            year
+            for year, (min_id, max_id) in self._partitions.items()
+            if min_id <= expense_id <= max_id
+        ]
+        row = None
+        with self._transaction() as conn:
+            for year in years:
+                row = conn.execute(
+                    f"UPDATE {_partition_table(year)} SET deleted = 1 "
+                    "WHERE id = ? AND deleted = 0 "
+                    "RETURNING category, subcategory, price, date, day",
+                    (expense_id,),
+                ).fetchone()
+                if row is not None:
+                    break
+            if row is None:
+                return None
+            category, subcategory, price, date, day = row
+            key = (*_rollup_key(day), category, subcategory)
+            conn.execute(_ROLLUP_REMOVE, (price, *key))
+            conn.execute(_ROLLUP_PRUNE, key)
+            week_key = (_week_key(day), category)
+            conn.execute(_WEEKLY_ROLLUP_REMOVE, (price, *week_key))
+            conn.execute(_WEEKLY_ROLLUP_PRUNE, week_key)
+        return category, subcategory, price, date
+
+    @metrics.timed("ledger.compact")
+    def compact(self):
+        years = self._years()
+        if not self.deleted_ids():
+            return 0
+        removed = 0
+        with self._transaction() as conn:
+            for year in years:
+                removed += conn.execute(
+                    f"DELETE FROM {_partition_table(year)} WHERE deleted = 1"
+                ).rowcount
+        return removed
+
+    def query(self, start=None, end=None, category=None):
+        # Only the partitions of the years in [start, end) are read
+        clauses, params = ["deleted = 0"], []
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(_micros(start))
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(_micros(end))
+        if category is not None:
+            clauses.append("category = ?")
+            params.append(category)
+        return self._select(
+            f"SELECT {_COLUMNS} FROM {{table}} WHERE {' AND '.join(clauses)}",
+            self._years(start, end),
+            params,
+            "ORDER BY id",
+        )
+
+    def count(self):
+        # The rollup counts the expenses of every month, so there's no need to scan them
+        return (
+            self._reader()
+            .execute("SELECT COALESCE(SUM(count), 0) FROM rollup")
+            .fetchone()[0]
+        )
+
+    def deleted_ids(self):
+        rows = self._select(
+            "SELECT id FROM {table} WHERE deleted = 1", self._years(), (), "ORDER BY id"
+        )
+        return [expense_id for expense_id, in rows]
+
+    def last_id(self):
+        return self._reader().execute("SELECT last_id FROM sequence").fetchone()[0]
+
+    def page_before(self, expense_id, limit):
+        # SQLite merges the partitions walked backwards along their primary key, so
+        # the cost only depends on the page size (and the number of years)
+        if expense_id is None:
+            years = self._years()
+            sql = f"SELECT {_COLUMNS} FROM {{table}} WHERE deleted = 0"
+            params = ()
+        else:
+            years = [
+                year
+                for year, (min_id, _) in self._partitions.items()
+                if min_id < expense_id
+            ]
+            sql = f"SELECT {_COLUMNS} FROM {{table}} WHERE id < ? AND deleted = 0"
+            params = (expense_id,)
+        return self._select(sql, years, params, f"ORDER BY id DESC LIMIT {int(limit)}")
+
+    def iter_after(self, expense_id, batch_size, start=None, end=None, typed=False):
+        clauses, params = ["id > ?", "deleted = 0"], []
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(_micros(start))
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(_micros(end))
+        columns = _TYPED_COLUMNS if typed else _COLUMNS
+        sql = f"SELECT {columns} FROM {{table}} WHERE {' AND '.join(clauses)}"
+        in_range = set(self._years(start, end))
+        while True:
+            years = [
+                year
+                for year, (_, max_id) in self._partitions.items()
+                if max_id > expense_id and year in in_range
+            ]
+            rows = self._select(
+                sql,
+                years,
+                (expense_id, *params),
+                f"ORDER BY id LIMIT {int(batch_size)}",
+            )
+            if not rows:
+                return
+            yield rows
+            expense_id = rows[-1][0]
+
+    def last_id_before(self, timestamp):
+        rows = self._select(
+            "SELECT MAX(id) FROM {table} WHERE ts <= ? AND deleted = 0",
+            self._years(end=timestamp + datetime.timedelta(microseconds=1)),
+            (_micros(timestamp),),
+        )
+        return max((row[0] for row in rows if row[0] is not None), default=0)
+
+    def rollup(self, year=None):
+        where, params = ("WHERE year = ?", (year,)) if year is not None else ("", ())
+        return (
+            self._reader()
+            .execute(
+                "SELECT year, month, category, subcategory, total, count "
+                f"FROM rollup {where} ORDER BY year, month",
+                params,
+            )
+            .fetchall()
+        )
+
+    def period_totals(self, period, day=None):
+        # Reads a single row per category (per subcategory for months and years) from
+        # the primary keys of the aggregates, whatever the size of the ledger
+        day = day or datetime.date.today()
+        if period == "weekly":
+            week = (day - datetime.timedelta(days=day.weekday())).isoformat()
+            sql, params = (
+                "SELECT category, total FROM weekly_rollup WHERE week = ?",
+                (week,),
+            )
+        elif period == "monthly":
+            sql, params = (
+                "SELECT category, SUM(total) FROM rollup "
+                "WHERE year = ? AND month = ? GROUP BY category",
+                (day.year, day.month),
+            )
+        elif period == "yearly":
+            sql, params = (
+                "SELECT category, SUM(total) FROM rollup WHERE year = ? GROUP BY category",
+                (day.year,),
+            )
+        else:
+            raise ValueError(f"unknown budget period {period}")
+        rows = self._reader().execute(sql, params)
+        # Rounded to the cent, so adding and removing prices leaves no float residue
+        return {category: round(total, 2) for category, total in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+
+
+def _legacy_row(month, category, subcategory, price, date, timestamp):
+    """
+    Return a row of an .xlsx ledger shaped as EXPENSE_HEADERS, or raise ValueError if
+    it can't be stored.
+    """
+    if month is None or subcategory is None or date is None:
+        raise ValueError("missing month, subcategory or date")
+    try:
+        price = float(price)
+    except TypeError:
+        raise ValueError(f"invalid price {price!r}") from None
+    if not math.isfinite(price):
+        raise ValueError(f"invalid price {price!r}")
+    # Cells edited in a spreadsheet app may have become dates: back to the ledger text
+    if isinstance(date, datetime.datetime):
+        date = date.strftime("%d/%m/%Y")
+    if isinstance(timestamp, datetime.datetime):
+        timestamp = timestamp.isoformat()
+    row = (month, category, subcategory, price, str(date), str(timestamp))
+    _typed_dates(row[4], row[5])
+    return row
+
+
+@metrics.timed("workbook.import")
+def import_xlsx(store, path=LOCAL_EXPENSE_PATH):
+    """
+    Append every expense of an .xlsx ledger (same headers as EXPENSE_HEADERS) to the
+    store, skipping (and logging) the rows that can't be stored.
+    """
+    wb = load_workbook(path, read_only=True)
+    rows = []
+    try:
+        for line, values in enumerate(
+            wb.active.iter_rows(
+                min_row=2, max_col=len(EXPENSE_HEADERS), values_only=True
+            ),
+            start=2,
+        ):
+            if values[1] is None:
+                continue
+            try:
+                rows.append(_legacy_row(*values))
+            except ValueError as e:
+                logger.warning(f"Row {line} of {path} skipped: {e}")
+    finally:
+        wb.close()
+    store.add_rows(rows)
+    return len(rows)
+
+
+def _open_expense_store(user_id):
+    """
+    Open the ledger of a user, importing the legacy expenses.xlsx the first time it is
+    created.
+    """
+    ledger_path = user_path(user_id, LOCAL_LEDGER_PATH)
+    expense_path = user_path(user_id, LOCAL_EXPENSE_PATH)
+    if not os.path.exists(ledger_path) and os.path.exists(expense_path):
+        # Built aside and moved in place once complete: if the import fails, it's
+        # tried again on the next start instead of leaving an empty ledger behind
+        import_path = ledger_path + ".import"
+        for leftover in (import_path, import_path + "-wal", import_path + "-shm"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        store = SQLiteExpenseStore(import_path)
+        try:
+            imported = import_xlsx(store, expense_path)
+        finally:
+            store.close()
+        os.replace(import_path, ledger_path)
+        logger.info(f"Imported {imported} expenses from {expense_path}")
+    return SQLiteExpenseStore(ledger_path)
+
+
+_stores = UserRegistry(_open_expense_store)
+get_expense_store = _stores.get
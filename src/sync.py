@@ -1,58 +1,113 @@
-import pandas as pd
+import datetime
+
 from apscheduler.schedulers.background import BackgroundScheduler
-from config import REMOTE_EXPENSE_SHEET, REMOTE_SPREADSHEET_ID, logger
-from utils import (
-    get_local_expense_wb,
-    get_remote_expense_wb,
-    load_settings,
-    save_settings,
+from config import (
+    LEDGER_COMPACTION_HOURS,
+    METRICS_DUMP_SECONDS,
+    METRICS_PATH,
+    SYNC_CHUNK_SIZE,
+    logger,
 )
+from coordinator import get_coordinator
+from metrics import metrics
+from settings import get_settings
+from storage import get_expense_store
+from users import ALLOWED_USER_IDS
 
 
+@metrics.timed("job.sync")
 def sync_to_google_sheets():
     """
-    Sync local expenses data to Google Sheets if synchronization is enabled.
-    Only uploads new records since the last upload timestamp.
+    Sync the owner's expenses to Google Sheets if synchronization is enabled.
+    Only uploads expenses with an ID above the sync cursor, streaming them from the
+    ledger in chunks of SYNC_CHUNK_SIZE rows per Sheets API call.
     """
     logger.info("Sync function started")
-    settings = load_settings()
-    if settings["google_sync"]["enabled"]:
+    settings = get_settings()
+    google_sync = settings.get("google_sync")
+    if google_sync["enabled"]:
         logger.info("Google sync is enabled")
-        wb, ws = get_local_expense_wb()
-        df = pd.DataFrame(ws.values)
-        if len(df.columns) > 0:
-            df.columns = df.iloc[0]
-            df = df[1:]
-
-        last_upload = pd.to_datetime(settings["google_sync"].get("last_upload"))
-        new_records = (
-            df[pd.to_datetime(df["Timestamp"]) > last_upload] if last_upload else df
-        )
+        store = get_expense_store()
+        cursor = google_sync["cursor"]
+        if cursor is None:
+            cursor = get_initial_cursor(store, google_sync.get("last_upload"))
+            get_coordinator().run_threadsafe(
+                settings.update, "google_sync", cursor=cursor, last_upload=None
+            )
+
+        if store.last_id() > cursor:
+            # gspread is only imported when there is something to upload
+            from remote import get_remote_expense_sheet
+
+            sheet = get_remote_expense_sheet()
+            for rows in store.iter_after(cursor, SYNC_CHUNK_SIZE):
+                # Month, Category, Subcategory, Price and Date
+                sheet.call("append_rows", [list(row[1:6]) for row in rows])
+                logger.info(f"Uploaded {len(rows)} records")
 
-        if not new_records.empty:
-            logger.info(f"New records to upload: {len(new_records)}")
-            sheet = get_remote_expense_wb(REMOTE_SPREADSHEET_ID, REMOTE_EXPENSE_SHEET)
-            records_to_upload = new_records[
-                ["Month", "Category", "Subcategory", "Price", "Date"]
-            ].values.tolist()
-            for record in records_to_upload:
-                sheet.append_row(record)
-                logger.info(f"Uploaded record: {record}")
-
-            new_last_upload = pd.to_datetime(new_records["Timestamp"]).max()
-            settings["google_sync"]["last_upload"] = new_last_upload.isoformat()
-            save_settings(settings)
+                # Advance the cursor per chunk, so a failure resumes after it
+                cursor = rows[-1][0]
+                get_coordinator().run_threadsafe(
+                    settings.update, "google_sync", cursor=cursor
+                )
         else:
             logger.info("No new records to upload")
     else:
         logger.info("Google sync is disabled")
 
 
+def get_initial_cursor(store, last_upload):
+    """
+    Translate the timestamp watermark used by older versions into a sync cursor.
+    """
+    if last_upload is None:
+        return 0
+    return store.last_id_before(datetime.datetime.fromisoformat(last_upload))
+
+
+def compact_ledger():
+    """
+    Drop the deleted expenses from the ledger of every user, in a single storage job each.
+    """
+    for user_id in ALLOWED_USER_IDS:
+        removed = get_coordinator(user_id).run_threadsafe(
+            get_expense_store(user_id).compact
+        )
+        if removed:
+            logger.info(
+                f"Ledger of {user_id} compacted, {removed} deleted expenses dropped"
+            )
+
+
 def start_scheduler():
     """
     Start the background scheduler to run the sync function at regular intervals.
+    The sync job is paused while Google sync is disabled in the settings.
+    The ledger compaction job runs every LEDGER_COMPACTION_HOURS hours, and the metrics
+    are dumped to METRICS_PATH every METRICS_DUMP_SECONDS seconds if it's set.
     """
     scheduler = BackgroundScheduler()
-    scheduler.add_job(sync_to_google_sheets, "interval", minutes=5)
+    scheduler.add_job(compact_ledger, "interval", hours=LEDGER_COMPACTION_HOURS)
+    if METRICS_PATH:
+        scheduler.add_job(
+            metrics.write_prometheus,
+            "interval",
+            seconds=METRICS_DUMP_SECONDS,
+            args=(METRICS_PATH,),
+        )
+    job = scheduler.add_job(sync_to_google_sheets, "interval", minutes=5)
+    if not get_settings().get("google_sync")["enabled"]:
+        job.pause()
+
+    def on_settings_change(section, changes):
+        if section == "google_sync" and "enabled" in changes:
+            if changes["enabled"]:
+                job.resume()
+                logger.info("Google sync job resumed")
+            else:
+                job.pause()
+                logger.info("Google sync job paused")
+
+    get_settings().subscribe(on_settings_change)
     scheduler.start()
     return scheduler
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import threading
+
+from config import TELEGRAM_USER_ID, TELEGRAM_USER_IDS
+from constants import LOCAL_USERS_PATH
+from telegram.ext import BaseUpdateProcessor
+
+# The owner comes first: the ledger, budgets and settings of older versions are theirs
+ALLOWED_USER_IDS = list(dict.fromkeys([str(TELEGRAM_USER_ID), *TELEGRAM_USER_IDS]))
+
+
+def user_key(user_id=None):
+    """
+    Return the key of a user's shard (the owner's if user_id is None).
+    """
+    return str(user_id) if user_id is not None else str(TELEGRAM_USER_ID)
+
+
+def is_allowed(user_id):
+    """
+    Check if a Telegram user is in the allow-list.
+    """
+    return str(user_id) in ALLOWED_USER_IDS
+
+
+def is_owner(user_id):
+    """
+    Check if a Telegram user is the owner of the bot (TELEGRAM_USER_ID).
+    """
+    return str(user_id) == str(TELEGRAM_USER_ID)
+
+
+def user_path(user_id, path):
+    """
+    Return where a user keeps the file at path.
+    The owner uses the paths as they are, so existing files stay where they were;
+    every other user gets the same layout under LOCAL_USERS_PATH/<user ID>.
+    """
+    key = user_key(user_id)
+    if key == str(TELEGRAM_USER_ID):
+        return path
+    return os.path.join(LOCAL_USERS_PATH, key, os.path.normpath(path))
+
+
+class UserRegistry:
+    """
+    One object per user, built with factory(user_id) the first time it's asked for and
+    shared afterwards. A user_id of None stands for the owner.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._objects = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id=None):
+        key = user_key(user_id)
+        with self._lock:
+            obj = self._objects.get(key)
+            if obj is None:
+                obj = self._objects[key] = self.factory(user_id)
+        return obj
+
+    def items(self):
+        """
+        Return the (user key, object) pairs built so far.
+        """
+        with self._lock:
+            return list(self._objects.items())
+
+    def clear(self):
+        """
+        Forget every object, so the next `get` builds them again.
+        """
+        with self._lock:
+            self._objects.clear()
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Handle updates concurrently, up to max_concurrent_updates at a time, except those of
+    the same user, which are handled one after the other in the order they arrived.
+    So a user's slow chart doesn't delay the others, and a conversation never sees two
+    of its messages at once.
+    The limit is enforced by the base class, which counts the updates waiting for the
+    previous ones of their user too.
+    """
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        # {user ID: [lock, updates holding or waiting for it]}
+        self._locks = {}
+
+    async def do_process_update(self, update, coroutine):
+        user = getattr(update, "effective_user", None)
+        key = user.id if user is not None else None
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
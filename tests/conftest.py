@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+# The bot modules in src/ import each other by bare name
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+for path in (ROOT_PATH, os.path.join(ROOT_PATH, "src")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """
+    Run every test in an empty directory, with the per-user objects built from scratch.
+    """
+    from budget import _budget_tables
+    from chart_cache import _chart_caches
+    from coordinator import _coordinators
+    from settings import _settings
+    from storage import _stores
+
+    monkeypatch.chdir(tmp_path)
+    registries = [_stores, _budget_tables, _settings, _chart_caches, _coordinators]
+    for registry in registries:
+        registry.clear()
+    yield tmp_path
+    for _, store in _stores.items():
+        store.close()
+    for registry in registries:
+        registry.clear()
@@ -0,0 +1,50 @@
+import asyncio
+import re
+
+import handlers
+import pytest
+from benchmarks.fakes import FakeContext, FakeMessage, FakeUpdate
+from constants import EXPENSE_BUTTON_PATTERN
+from storage import get_expense_store
+
+
+class RecordingMessage(FakeMessage):
+    def __init__(self, text=""):
+        super().__init__(text)
+        self.markups = []
+
+    async def reply_text(self, text, reply_markup=None, **kwargs):
+        self.markups.append(reply_markup)
+        return await super().reply_text(text, **kwargs)
+
+
+def send(handler, text="", context=None):
+    update = FakeUpdate()
+    update.message = RecordingMessage(text)
+    asyncio.run(handler(update, context or FakeContext()))
+    return update.message
+
+
+@pytest.mark.parametrize("price", [12.5, -3, 1e-05, 1e16])
+def test_every_expense_button_deletes_its_expense(price):
+    store = get_expense_store()
+    store.add("Food", "Market", price)
+
+    message = send(handlers.ask_deleting)
+    [[button]] = message.markups[-1].keyboard
+    assert re.match(EXPENSE_BUTTON_PATTERN, button.text)
+
+    send(handlers.handle_deletion, button.text)
+
+    assert store.count() == 0
+
+
+@pytest.mark.parametrize("text", ["nan", "inf", "-inf", "twelve"])
+def test_invalid_prices_are_not_saved(text):
+    context = FakeContext()
+    context.user_data.update(selected_category="Food", selected_subcategory="Market")
+
+    message = send(handlers.save_on_local_spreadsheet, text, context)
+
+    assert message.replies == 1
+    assert get_expense_store().count() == 0
@@ -0,0 +1,64 @@
+import asyncio
+import zipfile
+
+import handlers
+import pytest
+from benchmarks.fakes import FakeContext, FakeMessage, FakeUpdate
+from importer import read_expenses
+from storage import get_expense_store
+
+
+@pytest.fixture
+def garbage_xlsx(tmp_path):
+    path = tmp_path / "expenses.xlsx"
+    path.write_bytes(b"this is not a workbook" * 100)
+    return str(path)
+
+
+@pytest.fixture
+def renamed_zip_xlsx(tmp_path):
+    path = tmp_path / "expenses.xlsx"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("expenses.csv", "Date,Category,Subcategory,Price\n")
+    return str(path)
+
+
+@pytest.mark.parametrize("document", ["garbage_xlsx", "renamed_zip_xlsx"])
+def test_invalid_xlsx_is_a_value_error(request, document):
+    with pytest.raises(ValueError, match="not a valid .xlsx document"):
+        read_expenses(request.getfixturevalue(document))
+
+
+class FakeDocument:
+    def __init__(self, source):
+        self.file_name = "expenses.xlsx"
+        self.source = source
+
+    async def get_file(self):
+        return self
+
+    async def download_to_drive(self, path):
+        with open(self.source, "rb") as src, open(path, "wb") as dst:
+            dst.write(src.read())
+
+
+class RecordingMessage(FakeMessage):
+    def __init__(self, document):
+        super().__init__()
+        self.document = document
+        self.texts = []
+
+    async def reply_text(self, text, **kwargs):
+        self.texts.append(text)
+        return await super().reply_text(text, **kwargs)
+
+
+def test_import_of_an_invalid_xlsx_is_answered(garbage_xlsx):
+    update = FakeUpdate()
+    update.message = RecordingMessage(FakeDocument(garbage_xlsx))
+
+    state = asyncio.run(handlers.import_expenses(update, FakeContext()))
+
+    assert state == handlers.CHOOSING
+    assert update.message.texts[-1].startswith("I couldn't read this file")
+    assert get_expense_store().count() == 0
@@ -0,0 +1,41 @@
+import asyncio
+import threading
+
+import main
+from benchmarks.webhook import FakeBotAPI
+from config import TELEGRAM_USER_ID
+from outbox import outbox
+
+
+async def no_prewarm():
+    pass
+
+
+def test_pending_alerts_are_sent_when_the_bot_stops(monkeypatch):
+    api = FakeBotAPI()
+    threading.Thread(target=api.serve_forever, daemon=True).start()
+    # The charts aren't needed here, so the rendering workers aren't started
+    monkeypatch.setattr(main, "prewarm", no_prewarm)
+    # Long enough for the alert to still be pending when the bot stops
+    monkeypatch.setattr(outbox, "delay", 60)
+
+    application = main.build_application(base_url=api.url)
+    post_init = application.post_init
+
+    async def alert_and_stop(application):
+        await post_init(application)
+        outbox.alert(TELEGRAM_USER_ID, "Food", "Food is over budget")
+        asyncio.get_running_loop().call_later(0.5, application.stop_running)
+
+    application.post_init = alert_and_stop
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    try:
+        application.run_polling(stop_signals=None, poll_interval=0, timeout=1)
+    finally:
+        api.shutdown()
+        api.server_close()
+
+    _, chat_id, text = api.replies.get_nowait()
+    assert chat_id == str(TELEGRAM_USER_ID)
+    assert "Food is over budget" in text
+    assert api.replies.empty()
@@ -0,0 +1,44 @@
+import asyncio
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import handlers
+import pytest
+import render
+from benchmarks.fakes import FakeContext, FakeUpdate
+from storage import get_expense_store
+
+
+@pytest.fixture
+def expenses():
+    get_expense_store().add("Food", "Market", 12.5)
+    yield
+    render.shutdown_render_executor()
+
+
+def break_render_executor():
+    # A worker that dies the way an out of memory kill does
+    with pytest.raises(BrokenProcessPool):
+        render.get_render_executor().submit(os._exit, 1).result()
+
+
+def test_chart_is_drawn_after_a_worker_died(expenses):
+    break_render_executor()
+    update = FakeUpdate()
+
+    asyncio.run(handlers.show_yearly_chart(update, FakeContext()))
+
+    # The intro and the chart
+    assert update.message.replies == 2
+
+
+def test_broken_rendering_pool_is_answered(expenses, monkeypatch):
+    async def broken(chart, df, filename):
+        raise BrokenProcessPool("worker died")
+
+    monkeypatch.setattr(handlers, "render_chart", broken)
+    update = FakeUpdate()
+
+    asyncio.run(handlers.show_yearly_chart(update, FakeContext()))
+
+    assert update.message.replies == 1
@@ -0,0 +1,214 @@
+import datetime
+import os
+import sqlite3
+
+import pytest
+import storage
+from constants import EXPENSE_HEADERS, LOCAL_EXPENSE_PATH, LOCAL_LEDGER_PATH
+from openpyxl import Workbook
+from storage import SQLiteExpenseStore, get_expense_store
+
+
+def write_legacy_ledger(rows):
+    os.makedirs(os.path.dirname(LOCAL_EXPENSE_PATH), exist_ok=True)
+    wb = Workbook()
+    wb.active.append(EXPENSE_HEADERS)
+    for row in rows:
+        wb.active.append(row)
+    wb.save(LOCAL_EXPENSE_PATH)
+
+
+def expense(price, date="15/03/2024"):
+    return ["March", "Food", "Market", price, date, "2024-03-15T12:00:00"]
+
+
+def test_legacy_ledger_import_skips_malformed_rows():
+    write_legacy_ledger(
+        [
+            expense(12.5),
+            expense(None),
+            expense("twelve"),
+            expense(float("nan")),
+            expense(3, date=None),
+            expense(4, date="someday"),
+            expense(7),
+        ]
+    )
+
+    store = get_expense_store()
+
+    assert [row[4] for row in store.query()] == [12.5, 7.0]
+
+
+def test_failed_legacy_ledger_import_is_tried_again(monkeypatch):
+    write_legacy_ledger([expense(12.5), expense(7)])
+
+    def fail(store, path):
+        store.add_rows([tuple(expense(1.0))])
+        raise OSError("disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(storage, "import_xlsx", fail)
+        with pytest.raises(OSError):
+            storage._open_expense_store(None)
+    assert not os.path.exists(LOCAL_LEDGER_PATH)
+
+    store = get_expense_store()
+
+    assert store.count() == 2
+    assert not os.path.exists(LOCAL_LEDGER_PATH + ".import")
+
+
+def test_ledger_in_the_working_directory():
+    store = SQLiteExpenseStore("ledger.db")
+    store.add("Food", "Market", 12.5)
+
+    assert store.count() == 1
+    store.close()
+
+
+def write_version_3_ledger(path, rows, deleted):
+    """
+    Write a ledger as schema version 3 left it (a single expenses table), with the
+    expenses of deleted marked as deleted.
+    """
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.executescript(storage._MIGRATIONS[0])
+    conn.executemany(
+        "INSERT INTO expenses (month, category, subcategory, price, date, timestamp) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.executescript(storage._MIGRATIONS[1] + storage._MIGRATIONS[2])
+    for expense_id in deleted:
+        month, category, subcategory, price, date = conn.execute(
+            "SELECT month, category, subcategory, price, date FROM expenses "
+            "WHERE id = ?",
+            (expense_id,),
+        ).fetchone()
+        conn.execute("UPDATE expenses SET deleted = 1 WHERE id = ?", (expense_id,))
+        conn.execute(
+            "UPDATE rollup SET total = total - ?, count = count - 1 WHERE year = ? "
+            "AND month = ? AND category = ? AND subcategory = ?",
+            (price, int(date[6:10]), int(date[3:5]), category, subcategory),
+        )
+        conn.execute("DELETE FROM rollup WHERE count <= 0")
+    conn.execute("PRAGMA user_version = 3")
+    conn.close()
+
+
+def test_version_3_ledger_is_migrated():
+    write_version_3_ledger(
+        "ledger.db",
+        [
+            ("December", "Food", "Market", 10.0, "29/12/2024", "2024-12-29T20:00:00"),
+            ("December", "Food", "Market", 5.0, "30/12/2024", "2024-12-30 08:30:00"),
+            ("January", "Home", "Rent", 500.0, "01/01/2025", "2025-01-01T09:00:00"),
+            ("January", "Food", "Delivery", 7.5, "02/01/2025", "not a timestamp"),
+            ("January", "Food", "Market", 99.0, "03/01/2025", "2025-01-03T10:00:00"),
+        ],
+        deleted=[5],
+    )
+
+    store = SQLiteExpenseStore("ledger.db")
+
+    version = store._conn.execute("PRAGMA user_version").fetchone()[0]
+    assert version == len(storage._MIGRATIONS)
+    assert store._partitions == {2024: (1, 2), 2025: (3, 5)}
+    assert [row[0] for row in store.query()] == [1, 2, 3, 4]
+    assert store.deleted_ids() == [5]
+    assert sorted(store.rollup()) == [
+        (2024, 12, "Food", "Market", 15.0, 2),
+        (2025, 1, "Food", "Delivery", 7.5, 1),
+        (2025, 1, "Home", "Rent", 500.0, 1),
+    ]
+    # 29/12/2024 is a Sunday: the week from Monday 30/12/2024 spans both years
+    assert store.period_totals("weekly", datetime.date(2024, 12, 29)) == {"Food": 10.0}
+    assert store.period_totals("weekly", datetime.date(2025, 1, 2)) == {
+        "Food": 12.5,
+        "Home": 500.0,
+    }
+
+    [rows] = store.iter_after(0, 10, typed=True)
+    epoch = datetime.datetime(1970, 1, 1)
+    assert [(row[5], row[6]) for row in rows] == [
+        (
+            (datetime.date(year, month, day) - epoch.date()).days,
+            (when - epoch) // datetime.timedelta(microseconds=1),
+        )
+        for year, month, day, when in [
+            (2024, 12, 29, datetime.datetime(2024, 12, 29, 20)),
+            (2024, 12, 30, datetime.datetime(2024, 12, 30, 8, 30)),
+            (2025, 1, 1, datetime.datetime(2025, 1, 1, 9)),
+            # An unreadable timestamp counts as the start of the date
+            (2025, 1, 2, datetime.datetime(2025, 1, 2)),
+        ]
+    ]
+
+    # The sequence carries on from the old table
+    assert store.add("Food", "Market", 1.0, datetime.datetime(2025, 1, 4)) == 6
+    store.close()
+
+
+def test_delete_then_compact():
+    store = get_expense_store()
+    for day in (1, 2, 3):
+        store.add("Food", "Market", 10.0, datetime.datetime(2024, 5, day))
+
+    assert store.delete(2) == ("Food", "Market", 10.0, "02/05/2024")
+    assert store.delete(2) is None
+    assert [row[0] for row in store.query()] == [1, 3]
+    assert [row[0] for row in store.page_before(None, 10)] == [3, 1]
+    assert store.count() == 2
+    assert store.rollup() == [(2024, 5, "Food", "Market", 20.0, 2)]
+    assert store.deleted_ids() == [2]
+
+    assert store.compact() == 1
+    assert store.compact() == 0
+    assert store.deleted_ids() == []
+    assert [row[0] for row in store.query()] == [1, 3]
+    # IDs are never reused
+    assert store.add("Food", "Market", 10.0, datetime.datetime(2024, 5, 4)) == 4
+
+
+def test_pages_cross_year_partitions():
+    store = get_expense_store()
+    for when in [
+        datetime.datetime(2023, 12, 30),
+        datetime.datetime(2023, 12, 31),
+        datetime.datetime(2024, 1, 1),
+        datetime.datetime(2024, 1, 2),
+        datetime.datetime(2024, 1, 3),
+    ]:
+        store.add("Food", "Market", 1.0, when)
+    store.delete(3)
+
+    pages, cursor = [], None
+    while page := store.page_before(cursor, 2):
+        pages.append([row[0] for row in page])
+        cursor = page[-1][0]
+
+    assert pages == [[5, 4], [2, 1]]
+
+
+def test_weekly_totals_span_two_years():
+    store = get_expense_store()
+    # Monday 30/12/2024 to Sunday 05/01/2025, and the days around that week
+    store.add("Food", "Market", 1.0, datetime.datetime(2024, 12, 29))
+    store.add("Food", "Market", 2.0, datetime.datetime(2024, 12, 30))
+    store.add("Food", "Delivery", 3.0, datetime.datetime(2025, 1, 1))
+    store.add("Home", "Rent", 4.0, datetime.datetime(2025, 1, 5, 23, 59))
+    store.add("Food", "Market", 8.0, datetime.datetime(2025, 1, 6))
+
+    for day in (datetime.date(2024, 12, 30), datetime.date(2025, 1, 5)):
+        assert store.period_totals("weekly", day) == {"Food": 5.0, "Home": 4.0}
+    store.delete(2)
+    assert store.period_totals("weekly", datetime.date(2025, 1, 1)) == {
+        "Food": 3.0,
+        "Home": 4.0,
+    }
+    assert store.period_totals("monthly", datetime.date(2024, 12, 1)) == {"Food": 1.0}
+    assert store.period_totals("yearly", datetime.date(2025, 1, 1)) == {
+        "Food": 11.0,
+        "Home": 4.0,
+    }
@@ -0,0 +1,84 @@
+import math
+
+import pytest
+import remote
+import sync
+from benchmarks.ledger import generate_rows
+from settings import get_settings
+from storage import get_expense_store
+
+EXPENSES = 1234
+CHUNK_SIZE = 100
+
+
+class FailingWorksheet:
+    """
+    Worksheet that keeps the appended rows and fails the call number fail_on (from 1).
+    """
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.calls = 0
+        self.rows = []
+
+    def append_rows(self, rows, **kwargs):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise ConnectionError("connection lost")
+        self.rows.extend(rows)
+
+
+class FakeSheetClient:
+    def __init__(self, sheet):
+        self.sheet = sheet
+
+    def call(self, method, *args, **kwargs):
+        return getattr(self.sheet, method)(*args, **kwargs)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setattr(sync, "SYNC_CHUNK_SIZE", CHUNK_SIZE)
+    store = get_expense_store()
+    store.add_rows(generate_rows(EXPENSES))
+    get_settings().update("google_sync", enabled=True, cursor=0)
+    return store
+
+
+def use_sheet(monkeypatch, sheet):
+    monkeypatch.setattr(remote, "_remote_expense_sheet", FakeSheetClient(sheet))
+
+
+def expected_rows(store):
+    return [list(row[1:6]) for row in store.query()]
+
+
+def test_sync_uploads_in_chunks(monkeypatch, store):
+    sheet = FailingWorksheet()
+    use_sheet(monkeypatch, sheet)
+
+    sync.sync_to_google_sheets()
+
+    assert sheet.calls == math.ceil(EXPENSES / CHUNK_SIZE)
+    assert sheet.rows == expected_rows(store)
+    assert get_settings().get("google_sync")["cursor"] == store.last_id()
+
+    # Nothing new to upload: no more calls
+    sync.sync_to_google_sheets()
+    assert sheet.calls == math.ceil(EXPENSES / CHUNK_SIZE)
+
+
+def test_sync_resumes_after_a_failed_chunk(monkeypatch, store):
+    sheet = FailingWorksheet(fail_on=2)
+    use_sheet(monkeypatch, sheet)
+
+    with pytest.raises(ConnectionError):
+        sync.sync_to_google_sheets()
+    assert len(sheet.rows) == CHUNK_SIZE
+    assert get_settings().get("google_sync")["cursor"] == CHUNK_SIZE
+
+    sync.sync_to_google_sheets()
+
+    assert sheet.calls == math.ceil(EXPENSES / CHUNK_SIZE) + 1
+    assert sheet.rows == expected_rows(store)
+    assert get_settings().get("google_sync")["cursor"] == store.last_id()